@@ -0,0 +1,99 @@
+"""
+Measure the coverage and speed of the fast-path filename parser, and its agreement
+with guessit on the files it is confident about. Also compare the directory context
+path (base name + cached "Show/Season N" info) with guessit on the whole path.
+
+Usage: python benchmarks/bench_filename_parser.py [corpus_file] [-v]
+
+The corpus file contains one path per line. Defaults to filename_corpus.txt.
+"""
+
+import sys
+import time
+from pathlib import Path, PurePath
+
+import guessit
+
+from trakt_scrobbler.file_info import (
+    add_dir_year, cleanup_guess, get_dir_context, guess_with_context
+)
+from trakt_scrobbler.filename_parser import parse_filename
+
+
+def reference_guess(path):
+    try:
+        return cleanup_guess(dict(guessit.guessit(path)))
+    except TypeError:
+        # cleanup_guess can't handle some multi-episode guesses
+        return None
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if arg != "-v"]
+    verbose = "-v" in sys.argv[1:]
+    corpus = Path(args[0] if args else Path(__file__).parent / "filename_corpus.txt")
+    paths = [line for line in corpus.read_text(encoding="utf-8").splitlines() if line]
+
+    guessit.guessit(paths[0])  # exclude guessit's one-time rule compilation
+    start = time.perf_counter()
+    expected = [reference_guess(path) for path in paths]
+    guessit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = [parse_filename(path) for path in paths]
+    # the year from the show's folder, as in file_info.parse_path
+    fast = [guess and add_dir_year(path, guess) for path, guess in zip(paths, fast)]
+    fast_time = time.perf_counter() - start
+
+    confident = agree = 0
+    for path, exp, guess in zip(paths, expected, fast):
+        if guess is None:
+            continue
+        confident += 1
+        if cleanup_guess(dict(guess)) == exp:
+            agree += 1
+        elif verbose:
+            print(f"MISMATCH {path}\n  fast:    {guess}\n  guessit: {exp}")
+
+    total = len(paths)
+    print(f"paths: {total}, fast path confident on {confident} "
+          f"({100 * confident / total:.1f}%)")
+    print(f"agreement with guessit: {agree}/{confident} "
+          f"({100 * agree / max(confident, 1):.1f}%)")
+    print(f"guessit: {1e3 * guessit_time / total:.3f}ms/path, "
+          f"fast path: {1e3 * fast_time / total:.4f}ms/path")
+    blended = (fast_time + guessit_time * (total - confident) / total) / total
+    print(f"blended (fast path + guessit fallback): {1e3 * blended:.3f}ms/path")
+
+    # the files the fast path left over, that are in season folders
+    rest = [
+        (path, exp) for path, exp, guess in zip(paths, expected, fast)
+        if guess is None and get_dir_context(PurePath(path).parent)
+    ]
+    start = time.perf_counter()
+    with_context = [guess_with_context(path) for path, _ in rest]
+    context_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for path, _ in rest:
+        guessit.guessit(path)
+    rest_guessit_time = time.perf_counter() - start
+    agree = same_or_better = 0
+    for (path, exp), guess in zip(rest, with_context):
+        try:
+            guess = cleanup_guess(dict(guess))
+        except TypeError:
+            guess = None
+        agree += guess == exp
+        same_or_better += guess == exp or exp is None
+        if verbose and guess != exp:
+            print(f"CONTEXT MISMATCH {path}\n  context: {guess}\n  guessit: {exp}")
+    num = max(len(rest), 1)
+    print(f"directory context on the remaining {len(rest)} paths in season folders: "
+          f"{1e3 * context_time / num:.3f}ms/path vs guessit "
+          f"{1e3 * rest_guessit_time / num:.3f}ms/path")
+    print(f"agreement {agree}/{len(rest)}, "
+          f"identified where guessit failed: {same_or_better - agree}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Replay a recorded mpv IPC stream through the line framing of MPVMon.on_data,
+comparing it with the previous implementation (append to the buffer and split
+all of it on every read).
+
+Usage: python benchmarks/bench_mpv_ipc.py [recorded_stream] [read_size]
+
+The recording is the raw data sent by mpv over the socket, which can be captured
+with something like: socat -v UNIX-LISTEN:/tmp/proxy UNIX-CONNECT:/tmp/mpvsocket
+Without one, a stream of a minute of 60fps time-pos changes, with a large
+playlist reply in between, is generated.
+"""
+
+import json
+import sys
+import timeit
+
+from trakt_scrobbler.player_monitors.mpv import MPVMon
+
+
+def generate_stream():
+    lines = []
+    for frame in range(60 * 60):
+        lines.append({"event": "property-change", "id": 5, "name": "time-pos",
+                      "data": frame / 60})
+        if frame == 1800:
+            playlist = [{"filename": f"/media/tv/Show/Season 1/Show.S01E{i:02}.mkv",
+                         "id": i} for i in range(1, 2000)]
+            lines.append({"data": playlist, "error": "success", "request_id": 7})
+    return b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+
+
+class Framer:
+    """Just the framing parts of MPVMon"""
+
+    on_data = MPVMon.on_data
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.lines = 0
+
+    def on_line(self, line):
+        self.lines += 1
+
+
+class OldFramer:
+    def __init__(self):
+        self.buffer = b""
+        self.lines = 0
+
+    def on_data(self, data):
+        self.buffer += data
+        partial_line = b""
+        for line in self.buffer.splitlines(keepends=True):
+            if line.endswith(b"\n"):
+                self.on_line(line.decode(encoding="utf-8", errors="ignore"))
+            else:
+                partial_line = line
+        self.buffer = partial_line
+
+    def on_line(self, line):
+        self.lines += 1
+
+
+def replay(framer_cls, reads):
+    framer = framer_cls()
+    for data in reads:
+        framer.on_data(data)
+    return framer.lines
+
+
+def main():
+    args = sys.argv[1:]
+    if args and not args[0].isdigit():
+        with open(args.pop(0), "rb") as f:
+            stream = f.read()
+    else:
+        stream = generate_stream()
+    read_size = int(args[0]) if args else 4096
+    reads = [stream[i:i + read_size] for i in range(0, len(stream), read_size)]
+    expected = stream.count(b"\n")
+    assert replay(Framer, reads) == replay(OldFramer, reads) == expected
+
+    print(f"{len(stream) / 1024:.0f}KiB in {len(reads)} reads of {read_size} bytes, "
+          f"{expected} lines")
+    for name, framer_cls in (("previous", OldFramer), ("current", Framer)):
+        t = min(timeit.repeat(lambda: replay(framer_cls, reads), number=3, repeat=3)) / 3
+        print(f"  {name:8}: {t * 1000:7.2f}ms, {t / expected * 1e6:.2f}us/line")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Compare matching the include/exclude regexes one by one against MultiRegex.
+
+Usage: python benchmarks/bench_regex.py [num_patterns]
+"""
+
+import re
+import sys
+import timeit
+
+from trakt_scrobbler.utils import MultiRegex
+
+
+def make_patterns(count):
+    return [
+        re.compile(rf".*/Show{i:03}/Season (?P<season>\d+)/.*E(?P<episode>\d+).*")
+        for i in range(count)
+    ]
+
+
+def sequential(patterns, path):
+    for index, pattern in enumerate(patterns):
+        m = pattern.match(path)
+        if m:
+            return index, m
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+    patterns = make_patterns(count)
+    multi = MultiRegex(patterns)
+    paths = [
+        # miss, the common case for exclude_patterns
+        "/media/tv/Other Show/Season 1/Other Show S01E05.mkv",
+        # hit on the last pattern
+        f"/media/tv/Show{count - 1:03}/Season 2/Show S02E07.mkv",
+        # hit in the middle
+        f"/media/tv/Show{count // 2:03}/Season 2/Show S02E07.mkv",
+    ]
+    for path in paths:
+        expected, actual = sequential(patterns, path), multi.match(path)
+        if expected is None:
+            assert actual is None
+        else:
+            assert expected[0] == actual[0]
+            assert expected[1].groupdict() == actual[1].groupdict()
+        seq = min(timeit.repeat(lambda: sequential(patterns, path), number=200))
+        comb = min(timeit.repeat(lambda: multi.match(path), number=200))
+        print(f"{path}\n  sequential: {seq / 200 * 1e6:8.1f}us"
+              f"  combined: {comb / 200 * 1e6:8.1f}us  speedup: {seq / comb:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
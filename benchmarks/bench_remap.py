@@ -0,0 +1,58 @@
+"""
+Compare applying the remap rules one by one against the indexed RuleIndex.
+
+Usage: python benchmarks/bench_remap.py [num_rules]
+
+Half the generated rules match on title, the other half on path.
+"""
+
+import sys
+import timeit
+
+from trakt_scrobbler.mediainfo_remap import RuleIndex, parse_rules
+
+
+def make_rules(count):
+    rules = []
+    for i in range(count):
+        if i % 2:
+            match = {"title": f"Show {i:04}", "season": 1}
+        else:
+            match = {"path": rf".*/Show {i:04}/Season (?P<season>\d+)/.*"}
+        rules.append({"match": match, "type": "episode",
+                      "id": {"trakt_slug": f"show-{i}"}, "episode_delta": 1})
+    return parse_rules({"rules": rules})
+
+
+def sequential(rules, path, media_info):
+    for rule in rules:
+        upd = rule.apply(path, media_info)
+        if upd is not None:
+            return upd
+    return media_info
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    rules = make_rules(count)
+    index = RuleIndex(rules)
+    cases = [
+        # miss, the common case
+        "Other Show",
+        # title rule at the end
+        f"Show {count - 1 - count % 2:04}",
+        # path rule in the middle
+        f"Show {count // 2 - (count // 2) % 2:04}",
+    ]
+    for title in cases:
+        path = f"/media/tv/{title}/Season 1/{title} S01E05.mkv"
+        info = {"type": "episode", "title": title, "season": 1, "episode": 5}
+        assert sequential(rules, path, info) == index.apply(path, info)
+        seq = min(timeit.repeat(lambda: sequential(rules, path, info), number=100))
+        ind = min(timeit.repeat(lambda: index.apply(path, info), number=100))
+        print(f"{path}\n  sequential: {seq / 100 * 1e6:8.1f}us"
+              f"  indexed: {ind / 100 * 1e6:8.1f}us  speedup: {seq / ind:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Fixtures shared by the test modules."""
+
+import json
+import threading
+import time
+
+import requests
+from trakt_scrobbler.media_info import MediaInfo
+from trakt_scrobbler.player_monitors.monitor import PlayerState, State, WebInterfaceMon
+from trakt_scrobbler.player_monitors.mpv import MPVMon
+
+# the resolved config of a player monitor
+CONFIG = {
+    "ipc_path": "/tmp/mpvsocket", "poll_interval": 10, "read_timeout": 2,
+    "write_timeout": 60, "restart_delay": 0.1, "skip_interval": 5,
+    "preview_threshold": 80, "preview_duration": 60, "fast_pause_threshold": 1,
+    "fast_pause_duration": 5, "min_duration": 0, "fast_poll_interval": 2,
+    "idle_poll_interval": 30, "max_poll_interval": 60, "connect_timeout": 3,
+    "request_timeout": 10,
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeWebMon(WebInterfaceMon):
+    """Reports a playing file for the given number of polls, then fails."""
+
+    name = "fake"
+    exclude_import = True
+    URL = "http://localhost:8080"
+
+    def __init__(self, scrobble_queue, polls):
+        super().__init__(scrobble_queue)
+        self.polls = polls
+        self.poll_threads = set()
+        self.handle_threads = set()
+
+    def update_status(self):
+        self.poll_threads.add(threading.current_thread().name)
+        if not self.polls:
+            raise requests.HTTPError("done")
+        self.polls -= 1
+        self.status = {"state": 2, "filepath": "/a.mkv", "position": 1, "duration": 10}
+
+    def handle_status_update(self):
+        self.handle_threads.add(threading.current_thread().name)
+        self.prev_state = PlayerState(State.Playing, 3600, 10, MediaInfo(title="a"),
+                                      time.time())
+
+
+def position_replies(commands: bytes, pos: float) -> bytes:
+    """mpv's responses to the time-pos requests among the sent commands"""
+    replies = b""
+    for line in commands.splitlines():
+        command = json.loads(line)
+        if command["command"] == MPVMon.GET_POSITION:
+            reply = {"request_id": command["request_id"], "error": "success",
+                     "data": pos}
+            replies += json.dumps(reply).encode() + b"\n"
+    return replies
@@ -0,0 +1,64 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from trakt_scrobbler import backlog_cleaner
+from trakt_scrobbler.backlog_cleaner import BacklogCleaner
+from trakt_scrobbler.media_info import MediaInfo
+from trakt_scrobbler.utils import Scheduler
+
+from tests.helpers import FakeClock
+
+
+class TestBacklogCleaner(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(self.clock, threaded=False)
+        for name, value in (("scheduler", self.scheduler), ("read_json", lambda _: []),
+                            ("write_json", lambda *_: None)):
+            patcher = patch.object(backlog_cleaner, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_slow_clear(self):
+        cleaner = BacklogCleaner()
+        cleaner.add({"media_info": MediaInfo(type="movie", title="Movie"),
+                     "updated_at": 2e9})
+        added = threading.Event()
+        release = threading.Event()
+
+        def add_to_history(**item):
+            added.set()
+            release.wait(5)
+            return True
+
+        calls = []
+        self.scheduler.schedule(cleaner.clear_interval + 1, calls.append, "other")
+        self.clock.now += cleaner.clear_interval + 1
+        with patch.object(backlog_cleaner.trakt, "add_to_history", add_to_history):
+            # the slow clear doesn't hold up the other timer
+            self.scheduler.run_due()
+            self.assertEqual(calls, ["other"])
+            self.assertTrue(added.wait(5))
+            self.assertEqual(len(cleaner.backlog), 1)
+            release.set()
+            self.wait_for(lambda: not cleaner.backlog)
+        # and it is scheduled again, to be done by the same thread
+        self.wait_for(lambda: self.scheduler.time_left(cleaner.timer) is not None)
+        cleaner.add({"media_info": MediaInfo(type="movie", title="Movie"),
+                     "updated_at": 2e9})
+        self.clock.now += cleaner.clear_interval
+        with patch.object(backlog_cleaner.trakt, "add_to_history", return_value=True):
+            self.scheduler.run_due()
+            self.wait_for(lambda: not cleaner.backlog)
+        names = [thread.name for thread in threading.enumerate()]
+        self.assertEqual(names.count("backlog-cleaner"), 1)
+
+    @staticmethod
+    def wait_for(condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                raise AssertionError("timed out")
+            time.sleep(0.01)
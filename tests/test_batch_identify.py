@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from trakt_scrobbler.batch_identify import identify_batch, identify_one, walk_paths
+
+
+class TestBatchIdentify(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        season_dir = os.path.join(self.tmpdir.name, "Show Name", "Season 1")
+        os.makedirs(season_dir)
+        for name in ("Show.Name.S01E01.mkv", "Show.Name.S01E02.mkv", "notes.txt"):
+            open(os.path.join(season_dir, name), "w").close()
+        self.season_dir = season_dir
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_walk_paths(self):
+        extra = "https://example.org/Movie (2019).mkv"
+        paths = list(walk_paths([self.tmpdir.name, extra]))
+        self.assertEqual(paths, [
+            os.path.join(self.season_dir, "Show.Name.S01E01.mkv"),
+            os.path.join(self.season_dir, "Show.Name.S01E02.mkv"),
+            extra,
+        ])
+
+    def test_identify_batch(self):
+        paths = list(walk_paths([self.tmpdir.name]))
+        for workers in (1, 2):
+            results = list(identify_batch(paths, workers=workers))
+            self.assertEqual([r["path"] for r in results], paths)
+            self.assertEqual(
+                [r["media_info"]["episode"] for r in results], [1, 2]
+            )
+            self.assertIn("parse", results[0]["timings_ms"])
+
+    def test_ambiguous(self):
+        path = os.path.join(self.tmpdir.name, "Show.S01-S02.E03.mkv")
+        with mock.patch("trakt_scrobbler.notifier.notify") as notify:
+            result = identify_one(path)
+        notify.assert_not_called()
+        self.assertIsNone(result["media_info"])
+        self.assertEqual(len(result["warnings"]), 1)
+        self.assertIn("Multiple probable seasons", result["warnings"][0])
@@ -0,0 +1,42 @@
+import unittest
+
+import guessit
+
+from trakt_scrobbler.file_info import cleanup_guess
+from trakt_scrobbler.filename_parser import parse_filename
+
+
+class TestFilenameParser(unittest.TestCase):
+    def assertSameAsGuessit(self, path):
+        guess = parse_filename(path)
+        self.assertIsNotNone(guess, path)
+        self.assertEqual(guess, cleanup_guess(dict(guessit.guessit(path))), path)
+
+    def test_episodes(self):
+        for path in (
+            "/tv/Show Name/Season 2/Show.Name.S02E03.720p.WEB-DL.x264-GRP.mkv",
+            "/tv/show.name.s01e02.episode.title.mkv",
+            "/tv/Grey's Anatomy 3x07.mp4",
+            "/tv/Doctor Who (2005) - S01E02 - The End of the World.mkv",
+            "/tv/Show/Season 3/Show_S02E03_HDTV.avi",
+        ):
+            self.assertSameAsGuessit(path)
+
+    def test_movies(self):
+        for path in (
+            "/movies/Blade Runner 2049 (2017).mkv",
+            "/movies/Movie.Name.2019.1080p.BluRay.x264-GRP.mkv",
+            "/movies/2001 A Space Odyssey (1968).mkv",
+        ):
+            self.assertSameAsGuessit(path)
+
+    def test_not_confident(self):
+        for path in (
+            "/tv/The.Office.US.S01E01.mkv",
+            "/tv/Show.S01E02E03.mkv",
+            "/tv/Marvels.Agents.of.S.H.I.E.L.D.S01E01.mkv",
+            "/anime/[Group] Show - 12 (1080p) [ABCD1234].mkv",
+            "/movies/Heat.1995.x265-RARBG.mkv",
+            "/movies/Movie.mkv",
+        ):
+            self.assertIsNone(parse_filename(path), path)
@@ -0,0 +1,38 @@
+import json
+import pickle
+import unittest
+
+from trakt_scrobbler.media_info import MediaInfo, to_json
+
+
+class TestMediaInfo(unittest.TestCase):
+    def test_interned(self):
+        info = MediaInfo({"type": "episode", "title": "Show", "season": 1, "episode": 2})
+        self.assertIs(
+            MediaInfo(type="episode", title="Show", episode=2, season=1), info
+        )
+        self.assertIs(MediaInfo(info), info)
+        self.assertEqual(info, {"type": "episode", "title": "Show", "season": 1,
+                                "episode": 2})
+        self.assertNotEqual(info, {"type": "episode", "title": "Show"})
+        self.assertNotEqual(info, info.replace(episode=3))
+        self.assertEqual({info: 1}[MediaInfo(dict(info))], 1)
+
+    def test_immutable(self):
+        info = MediaInfo(type="episode", title="Show", season=1, episode=[1, 2],
+                         ids={"imdb": "tt0123456"})
+        self.assertEqual(info["episode"], (1, 2))
+        self.assertIsInstance(info["ids"], MediaInfo)
+        with self.assertRaises(TypeError):
+            info["episode"] = 3
+        new = info.replace(episode=1)
+        self.assertEqual(new["episode"], 1)
+        self.assertEqual(info["episode"], (1, 2))
+        self.assertIs(new["ids"], info["ids"])
+
+    def test_serialize(self):
+        info = MediaInfo(type="episode", title="Show", season=1, episode=[1, 2],
+                         ids={"imdb": "tt0123456"})
+        data = json.loads(json.dumps({"media_info": info}, default=to_json))
+        self.assertIs(MediaInfo(data["media_info"]), info)
+        self.assertIs(pickle.loads(pickle.dumps(info)), info)
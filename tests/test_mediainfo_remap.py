@@ -0,0 +1,195 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from trakt_scrobbler import mediainfo_remap, remap_schema
+from trakt_scrobbler.mediainfo_remap import (
+    RuleIndex,
+    RulesWatcher,
+    apply_remap_rules,
+    find_shadowed,
+    parse_rules,
+    read_file,
+    reload_rules,
+)
+
+
+def make_rules(rules):
+    return parse_rules({"rules": rules})
+
+
+class TestRuleIndex(unittest.TestCase):
+    def setUp(self):
+        self.rules = make_rules([
+            {"match": {"path": r".*/Show A/.*"}, "type": "episode",
+             "id": {"trakt_slug": "show-a"}},
+            {"match": {"title": "Show B", "season": 2}, "type": "episode",
+             "id": {"trakt_id": 2}, "season": 1},
+            {"match": {"path": r".*/(?P<title>[^/]+)/Extras/.*"}, "type": "movie",
+             "id": {"title": "{title} Extras"}},
+            {"match": {"title": "Show B"}, "type": "episode", "id": {"trakt_id": 3}},
+            {"match": {"path": r".*\.MKV", "title": "Show C"}, "type": "episode",
+             "id": {"trakt_id": 4}},
+        ])
+        self.index = RuleIndex(self.rules)
+
+    def unindexed(self, path, media_info):
+        for rule in self.rules:
+            upd = rule.apply(path, media_info)
+            if upd is not None:
+                return upd
+        return media_info
+
+    def test_same_as_unindexed(self):
+        cases = [
+            ("/tv/Show A/S01E01.mkv", {"type": "episode", "title": "Show A",
+                                       "season": 1, "episode": 1}),
+            ("/tv/Show B/S02E01.mkv", {"type": "episode", "title": "Show B",
+                                       "season": 2, "episode": 1}),
+            ("/tv/Show B/S03E01.mkv", {"type": "episode", "title": "Show B",
+                                       "season": 3, "episode": 1}),
+            (None, {"type": "episode", "title": "Show B", "season": 3, "episode": 1}),
+            ("/tv/Show A/Extras/a.mkv", {"type": "episode", "title": "a",
+                                         "season": 1, "episode": 2}),
+            ("/tv/Show D/Extras/a.mkv", {"type": "movie", "title": "a"}),
+            ("/tv/Show C/S01E01.MKV", {"type": "episode", "title": "Show C",
+                                       "season": 1, "episode": 1}),
+            ("/tv/Show C/S01E01.mkv", {"type": "episode", "title": "Show C",
+                                       "season": 1, "episode": 1}),
+            ("/tv/x.MKV", {"type": "episode", "season": 1, "episode": 1}),
+            ("/tv/Show E/S01E01.mkv", {"type": "episode", "title": "Show E",
+                                       "season": 1, "episode": 1}),
+        ]
+        for path, media_info in cases:
+            self.assertEqual(
+                self.index.apply(path, media_info),
+                self.unindexed(path, media_info),
+                path,
+            )
+
+    def test_candidates(self):
+        info = {"type": "episode", "title": "Show B", "season": 2, "episode": 1}
+        self.assertEqual(
+            list(self.index.candidates("/tv/Show B/S02E01.mkv", info)), [1, 3]
+        )
+        self.assertEqual(list(self.index.candidates(None, {"title": "Show E"})), [])
+
+    def test_find(self):
+        info = {"type": "episode", "title": "Show B", "season": 3, "episode": 1}
+        index, media_info = self.index.find("/tv/Show B/S03E01.mkv", info)
+        self.assertEqual(index, 3)
+        self.assertEqual(media_info["trakt_id"], 3)
+        self.assertEqual(self.index.find(None, {"title": "Show E"}),
+                         (None, {"title": "Show E"}))
+
+    def test_shadowed(self):
+        rules = make_rules([
+            {"match": {"title": "A", "season": "1:3"}, "type": "episode",
+             "id": {"trakt_id": 1}},
+            {"match": {"title": "A", "season": 2, "episode": 5}, "type": "episode",
+             "id": {"trakt_id": 2}},
+            {"match": {"title": "A", "season": "2:4"}, "type": "episode",
+             "id": {"trakt_id": 3}},
+            {"match": {"title": "A"}, "type": "episode", "id": {"trakt_id": 4}},
+            {"match": {"title": "A", "path": ".*"}, "type": "episode",
+             "id": {"trakt_id": 5}},
+            {"match": {"path": ".*/A/.*"}, "type": "episode", "id": {"trakt_id": 6}},
+        ])
+        self.assertEqual(find_shadowed(rules), {1: 0, 4: 3})
+
+    def test_no_copy_on_miss(self):
+        info = {"type": "episode", "title": "Show E", "season": 1, "episode": 1}
+        self.assertIs(self.index.apply("/tv/Show E/S01E01.mkv", info), info)
+
+
+RULE_TOML = """
+[[rules]]
+match.title = "Show A"
+type = "episode"
+id.trakt_id = {trakt_id}
+"""
+
+
+class TestReload(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.file = Path(tmp.name) / "remap_rules.toml"
+        self.cache_file = Path(tmp.name) / "cache.json"
+        patcher = mock.patch.object(mediainfo_remap, "_rules", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.info = {"type": "episode", "title": "Show A", "season": 1, "episode": 1}
+
+    def test_reload(self):
+        self.file.write_text(RULE_TOML.format(trakt_id=1))
+        self.assertTrue(reload_rules(self.file, self.cache_file))
+        self.assertEqual(apply_remap_rules(None, self.info)["trakt_id"], 1)
+
+        self.file.write_text(RULE_TOML.format(trakt_id=2))
+        listener = mock.Mock()
+        with mock.patch.object(mediainfo_remap, "_reload_listeners", [listener]):
+            self.assertTrue(reload_rules(self.file, self.cache_file))
+        old, new = listener.call_args.args
+        self.assertEqual(old.rules[0].id_value, 1)
+        self.assertEqual(new.rules[0].id_value, 2)
+        self.assertEqual(apply_remap_rules(None, self.info)["trakt_id"], 2)
+
+        self.file.unlink()
+        self.assertTrue(reload_rules(self.file, self.cache_file))
+        self.assertEqual(apply_remap_rules(None, self.info), self.info)
+
+    @mock.patch.object(mediainfo_remap, "_notify_invalid")
+    def test_keep_last_good(self, notify):
+        self.file.write_text(RULE_TOML.format(trakt_id=1))
+        reload_rules(self.file, self.cache_file)
+        for bad in ("[[rules]\n", RULE_TOML.format(trakt_id='"x"')):
+            self.file.write_text(bad)
+            self.assertFalse(reload_rules(self.file, self.cache_file))
+            self.assertEqual(apply_remap_rules(None, self.info)["trakt_id"], 1)
+        self.assertEqual(notify.call_count, 2)
+
+    def test_watcher_check(self):
+        watcher = RulesWatcher(self.file, cache_file=self.cache_file)
+        self.assertFalse(watcher.check())
+        self.file.write_text(RULE_TOML.format(trakt_id=1))
+        self.assertTrue(watcher.check())
+        self.assertEqual(apply_remap_rules(None, self.info)["trakt_id"], 1)
+        self.assertFalse(watcher.check())
+
+
+class TestRulesCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.file = Path(tmp.name) / "remap_rules.toml"
+        self.cache_file = Path(tmp.name) / "cache.json"
+        self.file.write_text(RULE_TOML.format(trakt_id=1))
+
+    def read(self):
+        with mock.patch.object(
+            remap_schema, "validate", wraps=remap_schema.validate
+        ) as validate:
+            rules = read_file(self.file, self.cache_file)
+        return [rule.id_value for rule in rules], validate.called
+
+    def test_cache(self):
+        self.assertEqual(self.read(), ([1], True))
+        self.assertEqual(self.read(), ([1], False))
+        # same contents, only the mtime changed
+        stat = self.file.stat()
+        os.utime(self.file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(self.read(), ([1], False))
+        self.file.write_text(RULE_TOML.format(trakt_id=22))
+        self.assertEqual(self.read(), ([22], True))
+        self.assertEqual(self.read(), ([22], False))
+
+    def test_other_file(self):
+        self.read()
+        other = self.file.with_name("other.toml")
+        other.write_bytes(self.file.read_bytes())
+        os.utime(other, ns=(self.file.stat().st_atime_ns, self.file.stat().st_mtime_ns))
+        self.file = other
+        self.assertEqual(self.read(), ([1], True))
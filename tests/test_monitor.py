@@ -1,21 +1,31 @@
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from unittest.mock import MagicMock, patch
-from trakt_scrobbler.player_monitors.monitor import Monitor, State
+
+import requests
+from trakt_scrobbler.file_info import rejection_counts
+from trakt_scrobbler.media_info import MediaInfo
+from trakt_scrobbler.player_monitors.monitor import Monitor, PlayerState, State
+from trakt_scrobbler.utils import Scheduler
+
+from tests.helpers import CONFIG, FakeClock, FakeWebMon
 
 
 class TestStateChange(unittest.TestCase):
     def setUp(self):
         self.media_infos = {
-            "show1": {
+            "show1": MediaInfo({
                 "title": "Breaking Bad",
                 "season": 5,
                 "episode": 13
-            },
-            "show2": {
+            }),
+            "show2": MediaInfo({
                 "title": "Westworld",
                 "season": 2,
                 "episode": 4
-            }
+            })
         }
 
         self.mocked_queue = MagicMock()
@@ -26,81 +36,281 @@ class TestStateChange(unittest.TestCase):
         self.assertRaises(StopIteration, next, self.mon.decide_action(None, None))
 
     def test_normal(self):
-        state = {
+        state = PlayerState(**{
             "progress": 30,
             "media_info": self.media_infos["show1"],
             "state": State.Playing,
             "duration": 120,
             "updated_at": 1
-        }
+        })
         actions = tuple(self.mon.decide_action(None, state))
         self.assertTupleEqual(('scrobble',), actions)
 
-        new_state = {
+        new_state = PlayerState(**{
             "progress": 50,
             "media_info": self.media_infos["show1"],
             "state": State.Paused,
             "duration": 120,
             "updated_at": 5
-        }
+        })
 
         actions = tuple(self.mon.decide_action(state, new_state))
         self.assertTupleEqual(('scrobble',), actions)
 
     def test_preview(self):
-        state_1 = {
+        state_1 = PlayerState(**{
             "progress": 90,
             "media_info": self.media_infos["show1"],
             "state": State.Playing,
             "duration": 120,
             "updated_at": 1
-        }
+        })
         actions = tuple(self.mon.decide_action(None, state_1))
         self.assertTupleEqual(('enter_preview',), actions)
 
         self.mon.preview = True
 
-        state_2 = {
+        state_2 = PlayerState(**{
             "progress": 91,
             "media_info": self.media_infos["show1"],
             "state": State.Paused,
             "duration": 120,
             "updated_at": 4
-        }
+        })
         actions = tuple(self.mon.decide_action(state_1, state_2))
         self.assertTupleEqual(('pause_preview',), actions)
 
-        state_3 = {
+        state_3 = PlayerState(**{
             "progress": 91,
             "media_info": self.media_infos["show1"],
             "state": State.Playing,
             "duration": 120,
             "updated_at": 100
-        }
+        })
         actions = tuple(self.mon.decide_action(state_2, state_3))
         self.assertTupleEqual(('resume_preview',), actions)
 
-        state_4 = {
+        state_4 = PlayerState(**{
             "progress": 94,
             "media_info": self.media_infos["show1"],
             "state": State.Stopped,
             "duration": 120,
             "updated_at": 110
-        }
+        })
         actions = tuple(self.mon.decide_action(state_3, state_4))
         self.assertTupleEqual(('exit_preview',), actions)
 
         self.mon.preview = False
 
-        state_5 = {
+        state_5 = PlayerState(**{
             "progress": 10,
             "media_info": self.media_infos["show1"],
             "state": State.Stopped,
             "duration": 120,
             "updated_at": 115
-        }
+        })
         actions = tuple(self.mon.decide_action(state_4, state_5))
         self.assertTupleEqual(('scrobble',), actions)
 
         actions = tuple(self.mon.decide_action(None, state_2))
         self.assertTupleEqual(('enter_preview',), actions)
+
+    def test_preview_timer(self):
+        clock = FakeClock()
+        scheduler = Scheduler(clock, threaded=False)
+        state = PlayerState(**{
+            "progress": 90,
+            "media_info": self.media_infos["show1"],
+            "state": State.Playing,
+            "duration": 120,
+            "updated_at": 1
+        })
+        paused = state.replace(state=State.Paused, updated_at=30)
+        with patch('trakt_scrobbler.player_monitors.monitor.scheduler', scheduler):
+            self.mon.scrobble_if_state_changed(None, state)
+            self.assertTrue(self.mon.preview)
+            clock.now = 30
+            self.mon.scrobble_if_state_changed(state, paused)
+        # the timer doesn't run while paused
+        clock.now = 1000
+        scheduler.run_due()
+        self.mocked_queue.put.assert_not_called()
+
+        playing = state.replace(updated_at=1000)
+        self.mon.scrobble_if_state_changed(paused, playing)
+        clock.now += self.mon.preview_duration - 31
+        scheduler.run_due()
+        self.mocked_queue.put.assert_not_called()
+        clock.now += 1
+        scheduler.run_due()
+        self.mocked_queue.put.assert_called_once_with(("start", playing))
+        self.assertFalse(self.mon.preview)
+
+    def test_multi_episode(self):
+        media_info = MediaInfo(type="episode", title="Show", season=1, episode=[1, 2])
+        state = self.mon.parse_status({"media_info": media_info, "duration": 100,
+                                       "position": 60, "state": State.Playing})
+        self.assertIs(state.media_info, media_info.replace(episode=2))
+        self.assertEqual(state.duration, 50)
+        self.assertEqual(state.progress, 20)
+
+    def test_min_duration(self):
+        status = {
+            "filepath": "/tv/Breaking.Bad.S05E13.mkv",
+            "duration": 90,
+            "position": 30,
+            "state": State.Playing,
+        }
+        self.mon.min_duration = 120
+        before = rejection_counts["too_short"]
+        self.assertIsNone(self.mon.parse_status(dict(status)))
+        self.assertIsNone(self.mon.parse_status(dict(status, position=40)))
+        # once per file, not per poll
+        self.assertEqual(rejection_counts["too_short"], before + 1)
+
+        self.mon.min_duration = 60
+        state = self.mon.parse_status(dict(status))
+        self.assertEqual(state.media_info["title"], "Breaking Bad")
+
+
+class TestPollDelay(unittest.TestCase):
+    def setUp(self):
+        with patch.object(FakeWebMon, "autoload_cfg", return_value=dict(CONFIG)):
+            self.mon = FakeWebMon(MagicMock(), polls=0)
+
+    def test_unreachable(self):
+        delays = []
+        with patch.object(self.mon, "update_status", side_effect=requests.ConnectionError):
+            for _ in range(5):
+                self.assertTrue(self.mon.poll())
+                delays.append(self.mon.next_poll_delay(None, None))
+        self.assertEqual(delays, [10, 20, 40, 60, 60])
+        self.mon.polls = 1
+        self.mon.poll()
+        self.assertEqual(self.mon.failed_polls, 0)
+
+    def test_states(self):
+        playing = PlayerState(State.Playing, 3600, 10, MediaInfo(title="a"), time.time())
+        paused = playing.replace(state=State.Paused)
+        delay = self.mon.next_poll_delay
+        self.assertEqual(delay(None, None), 30)
+        self.assertEqual(delay(None, playing), 2)
+        self.assertEqual(delay(playing, playing), 10)
+        self.assertEqual(delay(playing, paused), 2)
+        self.assertEqual(delay(paused, paused), 30)
+        self.assertEqual(delay(playing, playing.replace(media_info=MediaInfo(title="b"))), 2)
+        self.assertEqual(delay(playing, None), 30)
+
+    def test_boundaries(self):
+        now = time.time()
+        state = PlayerState(State.Playing, 1000, 70, MediaInfo(title="a"), now - 99)
+        delay = self.mon.next_poll_delay
+        # progress is now at 79.9%, so poll just after the watched threshold
+        with patch("time.time", return_value=now):
+            self.assertAlmostEqual(delay(state, state), 1.5)
+            # end of the file
+            state.progress = 90
+            self.assertAlmostEqual(delay(state, state), 1.5)
+            # not playing, so progress isn't extrapolated
+            paused = state.replace(state=State.Paused)
+            self.assertEqual(delay(paused, paused), 30)
+
+        clock = FakeClock()
+        scheduler = Scheduler(clock, threaded=False)
+        with patch("trakt_scrobbler.player_monitors.monitor.scheduler", scheduler):
+            self.mon.fast_pause_timer = scheduler.schedule(4, print)
+            self.assertEqual(delay(paused, paused), 4.5)
+            self.mon.fast_pause_timer.cancel()
+            self.assertEqual(delay(paused, paused), 30)
+
+    def test_unchanged(self):
+        self.mon.status = {"state": State.Playing, "filepath": "/tv/Show.S01E01.mkv",
+                           "position": 100, "duration": 1000}
+        with patch.object(self.mon, "handle_status_update") as handle:
+            self.mon.handle_poll()
+            handle.assert_called_once()
+            self.mon.prev_state = PlayerState(State.Playing, 1000, 10,
+                                              MediaInfo(title="a"), time.time() - 5)
+            self.mon.status["position"] = 105
+            self.mon.handle_poll()
+            handle.assert_called_once()
+            self.assertEqual(self.mon.prev_state.progress, 10.5)
+            self.assertEqual(self.mon.poll_counts, {"total": 2, "unchanged": 1})
+            # seeked
+            self.mon.status["position"] = 500
+            self.mon.handle_poll()
+            self.assertEqual(handle.call_count, 2)
+            self.mon.status["state"] = State.Paused
+            self.mon.handle_poll()
+            self.assertEqual(handle.call_count, 3)
+
+    def test_rules_reloaded(self):
+        self.mon.status = {"state": State.Playing, "filepath": "/tv/Show.S01E01.mkv",
+                           "position": 100, "duration": 1000}
+        self.mon.prev_state = PlayerState(State.Playing, 1000, 10,
+                                          MediaInfo(title="a"), time.time())
+        with patch.object(self.mon, "handle_status_update") as handle:
+            self.mon.handle_poll()
+            self.mon.handle_poll()
+            handle.assert_called_once()
+            with patch("trakt_scrobbler.mediainfo_remap._generation", 1000):
+                self.mon.handle_poll()
+            self.assertEqual(handle.call_count, 2)
+
+    def test_stats_logged(self):
+        self.mon.status = None
+        with patch("trakt_scrobbler.player_monitors.monitor.logger") as logger:
+            self.mon.handle_poll()
+            logger.debug.assert_not_called()
+            self.mon.stats_logged_at -= self.mon.STATS_LOG_INTERVAL
+            self.mon.handle_poll()
+            logger.debug.assert_called_once()
+            self.assertIn("polls", logger.debug.call_args[0][0])
+            self.mon.handle_poll()
+            logger.debug.assert_called_once()
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(0.5)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRequests(unittest.TestCase):
+    def setUp(self):
+        server = HTTPServer(("127.0.0.1", 0), SlowHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        class SlowWebMon(FakeWebMon):
+            URL = f"http://127.0.0.1:{server.server_port}"
+
+            def update_status(self):
+                self.get(self.URL)
+
+        config = dict(CONFIG, request_timeout=0.1)
+        with patch.object(SlowWebMon, "autoload_cfg", return_value=config):
+            self.mons = [SlowWebMon(MagicMock(), polls=0) for _ in range(2)]
+
+    def test_timeout(self):
+        mon = self.mons[0]
+        start = time.monotonic()
+        self.assertTrue(mon.poll())
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(mon.failed_polls, 1)
+        self.assertEqual(mon.status, {})
+        self.assertFalse(mon.can_connect())
+
+    def test_shared_pool(self):
+        self.assertIs(self.mons[0].adapter, self.mons[1].adapter)
+        counts = self.mons[0].adapter.counts.copy()
+        for mon in self.mons:
+            mon.poll()
+        stats = self.mons[0].adapter.stats()
+        self.assertEqual(stats["requests"] - counts["requests"], 2)
+        self.assertEqual(stats["timeouts"] - counts["timeouts"], 2)
@@ -0,0 +1,210 @@
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from trakt_scrobbler.player_monitors.monitor import State
+from trakt_scrobbler.player_monitors.mpv import MPVMon, MPVPosixMon
+from trakt_scrobbler.utils import Scheduler
+
+from tests.helpers import CONFIG, FakeClock
+
+
+class TestMPVEvents(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch("trakt_scrobbler.player_monitors.mpv.scheduler",
+                        Scheduler(self.clock, threaded=False))
+        self.scheduler = patcher.start()
+        self.addCleanup(patcher.stop)
+        with patch.object(MPVMon, "autoload_cfg", return_value=dict(CONFIG)):
+            self.mon = MPVMon(MagicMock())
+        self.statuses = []
+        self.mon.handle_status_update = lambda: self.statuses.append(self.mon.status)
+
+    def send(self, *messages):
+        self.mon.on_data(b"".join(json.dumps(m).encode() + b"\n" for m in messages))
+
+    def prop(self, name, data=None):
+        msg = {"event": "property-change", "name": name}
+        if data is not None:
+            msg["data"] = data
+        return msg
+
+    def reply_position(self, pos):
+        """Answer the pending time-pos requests, like mpv would."""
+        self.mon.take_pending_writes()
+        ids = [request_id for request_id, command in self.mon.sent_commands.items()
+               if command == MPVMon.GET_POSITION]
+        self.send(*({"request_id": request_id, "error": "success", "data": pos}
+                    for request_id in ids))
+        return len(ids)
+
+    def start_file(self, path="/tv/Show.S01E01.mkv", pause=False):
+        self.send(
+            self.prop("path", path), self.prop("working-directory", "/"),
+            self.prop("metadata", {}), self.prop("duration", 100.0),
+            self.prop("pause", pause),
+        )
+        self.reply_position(0.0)
+
+    def test_observe(self):
+        self.mon.observe_props()
+        commands = []
+        while not self.mon.write_queue.empty():
+            commands.append(json.loads(self.mon.write_queue.get_nowait())["command"])
+        self.assertEqual([c[0] for c in commands], ["observe_property"] * 5)
+        self.assertNotIn("time-pos", [c[2] for c in commands])
+        self.assertEqual(commands[-1][2], "pause")
+
+    def test_events(self):
+        self.start_file()
+        self.assertEqual(len(self.statuses), 1)
+        self.assertEqual(self.statuses[-1]["state"], State.Playing)
+
+        self.send(self.prop("pause", True))
+        # the status waits for the current position
+        self.assertEqual(len(self.statuses), 1)
+        self.assertEqual(self.reply_position(29.0), 1)
+        self.assertEqual(self.statuses[-1]["state"], State.Paused)
+        self.assertEqual(self.statuses[-1]["position"], 29.0)
+
+        # seek
+        self.send({"event": "seek"}, {"event": "playback-restart"})
+        self.reply_position(70.0)
+        self.assertEqual(self.statuses[-1]["position"], 70.0)
+
+        # the last known values are kept for the end-file status
+        self.send(self.prop("path"), {"event": "end-file"})
+        self.assertEqual(self.statuses[-1]["state"], State.Stopped)
+        self.assertEqual(self.statuses[-1]["position"], 70.0)
+        self.assertEqual(self.statuses[-1]["filepath"], "/tv/Show.S01E01.mkv")
+
+    def test_stop_position(self):
+        with patch("time.time", return_value=1000.0):
+            self.start_file()
+        # played for 8s after the position was last polled
+        with patch("time.time", return_value=1008.0):
+            self.send({"event": "end-file"})
+        self.assertEqual(self.statuses[-1]["state"], State.Stopped)
+        self.assertEqual(self.statuses[-1]["position"], 8.0)
+
+        # no extrapolation when stopped from paused
+        self.start_file("/tv/Show.S01E02.mkv", pause=True)
+        self.send({"event": "playback-restart"})
+        self.reply_position(0.0)
+        self.assertEqual(self.statuses[-1]["state"], State.Paused)
+        with patch("time.time", return_value=time.time() + 8):
+            self.send({"event": "end-file"})
+        self.assertEqual(self.statuses[-1]["position"], 0.0)
+
+    def test_poll_position(self):
+        self.mon.on_connect()
+        self.start_file()
+        count = len(self.statuses)
+        self.clock.now += self.mon.poll_interval
+        self.scheduler.run_due()
+        # polled while playing, without a status update
+        self.assertEqual(self.reply_position(42.0), 1)
+        self.assertEqual(self.mon.vars["time-pos"], 42.0)
+        self.assertEqual(len(self.statuses), count)
+
+        self.send(self.prop("pause", True))
+        self.reply_position(43.0)
+        self.clock.now += self.mon.poll_interval
+        self.scheduler.run_due()
+        self.assertEqual(self.reply_position(0.0), 0)
+
+    def test_disconnect(self):
+        self.mon.on_connect()
+        self.start_file()
+        self.send(self.prop("pause", True))
+        self.mon.on_disconnect()
+        # nothing is left over for the next connection
+        self.assertEqual(self.mon.take_pending_writes(), b"")
+        self.assertEqual(self.mon.sent_commands, {})
+        self.assertIsNone(self.mon.position_timer)
+        self.assertIsNone(self.scheduler.run_due())
+        self.assertEqual(self.statuses[-1]["state"], State.Stopped)
+
+    def test_next_file(self):
+        self.start_file()
+        self.send({"event": "end-file"})
+        count = len(self.statuses)
+        self.send(self.prop("path", "/tv/Show.S01E02.mkv"),
+                  self.prop("duration", 50.0))
+        self.reply_position(None)
+        # position of the new file is unknown yet
+        self.assertEqual(len(self.statuses), count)
+        self.send({"event": "playback-restart"})
+        self.reply_position(0.0)
+        self.assertEqual(self.statuses[-1]["filepath"], "/tv/Show.S01E02.mkv")
+        self.assertEqual(self.statuses[-1]["duration"], 50.0)
+        self.assertEqual(self.statuses[-1]["state"], State.Playing)
+
+    def test_partial_lines(self):
+        data = json.dumps(self.prop("pause", True)).encode() + b"\n"
+        self.start_file()
+        self.mon.on_data(data[:10])
+        self.mon.on_data(data[10:])
+        self.reply_position(1.0)
+        self.assertEqual(self.statuses[-1]["state"], State.Paused)
+
+    def test_framing(self):
+        self.start_file()
+        data = (json.dumps(self.prop("path", "/tv/Shöw.S01E02.mkv"),
+                           ensure_ascii=False).encode()
+                + b"\n" + json.dumps(self.prop("duration", 50.0)).encode() + b"\n")
+        split = data.index("ö".encode()) + 1  # in the middle of the character
+        self.mon.on_data(data[:split])
+        self.mon.on_data(data[split:split + 5])
+        self.assertEqual(self.mon.vars["path"], "/tv/Show.S01E01.mkv")
+        self.mon.on_data(data[split + 5:])
+        self.assertEqual(self.mon.vars["path"], "/tv/Shöw.S01E02.mkv")
+        self.assertEqual(self.mon.vars["duration"], 50.0)
+        self.assertEqual(self.mon.buffer, b"")
+
+    def test_batched_writes(self):
+        self.mon.observe_props()
+        pending = self.mon.take_pending_writes()
+        self.assertEqual(pending.count(b"\n"), 5)
+        self.assertTrue(self.mon.write_queue.empty())
+        self.assertEqual(self.mon.take_pending_writes(), b"")
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+class TestWaitForSocket(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.ipc_path = os.path.join(tmp.name, "mpvsocket")
+        config = dict(CONFIG, ipc_path=self.ipc_path)
+        with patch.object(MPVPosixMon, "autoload_cfg", return_value=config):
+            self.mon = MPVPosixMon(MagicMock())
+
+    def listen(self):
+        server = socket.socket(socket.AF_UNIX)
+        self.addCleanup(server.close)
+        server.bind(self.ipc_path)
+        server.listen()
+
+    def test_wait(self):
+        self.assertFalse(self.mon.can_connect())
+        timer = threading.Timer(0.2, self.listen)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        start = time.monotonic()
+        self.mon.wait_for_player()
+        self.assertLess(time.monotonic() - start, self.mon.poll_interval / 2)
+        self.assertTrue(self.mon.can_connect())
+
+    def test_missing_dir(self):
+        self.mon.ipc_path = os.path.join(self.ipc_path, "missing", "mpvsocket")
+        with patch("time.sleep") as sleep:
+            self.mon.wait_for_player()
+        sleep.assert_called_once_with(self.mon.poll_interval)
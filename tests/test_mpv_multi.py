@@ -0,0 +1,98 @@
+import json
+import os
+import socket
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from trakt_scrobbler.player_monitors.monitor import State
+from trakt_scrobbler.player_monitors.mpv_multi import MPVConnection, MPVMultiMon
+
+from tests.helpers import position_replies
+
+CONFIG = {
+    "ipc_paths": [], "ipc_path": "", "poll_interval": 10, "read_timeout": 2,
+    "write_timeout": 60, "restart_delay": 0.1, "skip_interval": 5,
+    "preview_threshold": 80, "preview_duration": 60, "fast_pause_threshold": 1,
+    "fast_pause_duration": 5, "min_duration": 0,
+}
+
+
+def events(path, pause=False):
+    props = [("path", path), ("working-directory", "/"), ("duration", 100.0),
+             ("pause", pause)]
+    return b"".join(
+        json.dumps({"event": "property-change", "name": name, "data": data}).encode()
+        + b"\n" for name, data in props
+    )
+
+
+@unittest.skipUnless(os.name == "posix", "unix sockets")
+class TestMPVMultiMon(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.servers = {}
+        for name in ("a", "b"):
+            path = os.path.join(self.dir, f"mpv-{name}.sock")
+            server = socket.socket(socket.AF_UNIX)
+            server.bind(path)
+            server.listen()
+            self.addCleanup(server.close)
+            self.servers[path] = server
+        # a leftover socket file without an mpv behind it
+        stale = socket.socket(socket.AF_UNIX)
+        stale.bind(os.path.join(self.dir, "mpv-stale.sock"))
+        stale.close()
+
+        config = dict(CONFIG, ipc_paths=[os.path.join(self.dir, "mpv-*.sock")])
+        patcher = patch.object(MPVMultiMon, "autoload_cfg", return_value=config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(MPVConnection, "autoload_cfg", return_value=config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.statuses = []
+        patcher = patch.object(
+            MPVConnection, "handle_status_update",
+            lambda conn: self.statuses.append((conn.ipc_path, conn.status)),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mon = MPVMultiMon(MagicMock())
+
+    def test_multiplex(self):
+        self.mon.connect_new()
+        self.assertEqual(sorted(self.mon.connections), sorted(self.servers))
+        clients = {path: server.accept()[0] for path, server in self.servers.items()}
+        for client in clients.values():
+            self.addCleanup(client.close)
+            # each connection subscribes to the properties
+            client.settimeout(1)
+            self.assertIn(b"observe_property", client.recv(4096))
+
+        path_a, path_b = sorted(clients)
+        clients[path_a].sendall(events("/tv/A.S01E01.mkv"))
+        clients[path_b].sendall(events("/tv/B.S01E01.mkv", pause=True))
+        while len(self.statuses) < 2:
+            self.mon.poll(0.1)
+            for client in clients.values():
+                client.setblocking(False)
+                try:
+                    client.sendall(position_replies(client.recv(4096), 10.0))
+                except BlockingIOError:
+                    pass
+        by_path = dict(self.statuses)
+        self.assertEqual(by_path[path_a]["filepath"], "/tv/A.S01E01.mkv")
+        self.assertEqual(by_path[path_a]["state"], State.Playing)
+        self.assertEqual(by_path[path_b]["filepath"], "/tv/B.S01E01.mkv")
+        self.assertEqual(by_path[path_b]["state"], State.Paused)
+
+        # closing one of them stops it, without affecting the other
+        clients[path_a].close()
+        while path_a in self.mon.connections:
+            self.mon.poll(1)
+        self.assertEqual(self.statuses[-1][0], path_a)
+        self.assertEqual(self.statuses[-1][1]["state"], State.Stopped)
+        self.assertIn(path_b, self.mon.connections)
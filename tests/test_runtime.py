@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from trakt_scrobbler.player_monitors.monitor import State
+from trakt_scrobbler.player_monitors.runtime import MonitorRuntime, supports_async
+
+from tests.helpers import CONFIG, FakeWebMon, position_replies
+
+
+class TestMonitorRuntime(unittest.TestCase):
+    def make_mon(self, polls):
+        config = dict(CONFIG, poll_interval=0)
+        with patch.object(FakeWebMon, "autoload_cfg", return_value=config):
+            return FakeWebMon(MagicMock(), polls)
+
+    @patch("trakt_scrobbler.player_monitors.monitor.notify")
+    def test_web_monitors(self, notify):
+        mons = [self.make_mon(3), self.make_mon(5)]
+        self.assertTrue(all(map(supports_async, mons)))
+        runtime = MonitorRuntime(mons, max_workers=2)
+        runtime.start()
+        runtime.join(5)
+        self.assertFalse(runtime.is_alive())
+        for mon in mons:
+            self.assertEqual(mon.polls, 0)
+            # the requests and the state machine run on the pool, not the loop
+            for threads in (mon.poll_threads, mon.handle_threads):
+                self.assertTrue(threads)
+                self.assertTrue(all(t.startswith("monitor-io") for t in threads))
+        self.assertEqual(notify.call_count, 2)
+
+    @patch("trakt_scrobbler.player_monitors.monitor.notify")
+    def test_blocked_monitor(self, notify):
+        blocked, other = self.make_mon(1), self.make_mon(5)
+        release = threading.Event()
+        handle = blocked.handle_status_update
+        # like waiting for guessit, while the warm-up holds its lock
+        blocked.handle_status_update = lambda: release.wait(5) and handle()
+        runtime = MonitorRuntime([blocked, other], max_workers=2)
+        runtime.start()
+        deadline = time.monotonic() + 5
+        while other.polls and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(other.polls, 0)
+        self.assertFalse(release.is_set())
+        release.set()
+        runtime.join(5)
+        self.assertFalse(runtime.is_alive())
+
+
+@unittest.skipUnless(os.name == "posix", "needs unix sockets")
+class TestMPVAsync(unittest.TestCase):
+    def setUp(self):
+        from trakt_scrobbler.player_monitors.mpv import MPVPosixMon
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.ipc_path = os.path.join(tmp.name, "mpvsocket")
+        config = dict(CONFIG, ipc_path=self.ipc_path, read_timeout=0.1)
+        with patch.object(MPVPosixMon, "autoload_cfg", return_value=config):
+            self.mon = MPVPosixMon(MagicMock())
+        self.statuses = []
+        self.mon.handle_status_update = lambda: self.statuses.append(self.mon.status)
+
+    def serve(self, server):
+        while True:
+            conn, _ = server.accept()
+            commands = conn.recv(4096)
+            if commands:
+                break
+            conn.close()  # just checking if it can connect
+        with conn:
+            while commands.count(b"\n") < 5:
+                commands += conn.recv(4096)
+            props = {"path": "/tv/Show.S01E01.mkv", "working-directory": "/",
+                     "metadata": {}, "duration": 100.0, "pause": False}
+            conn.sendall(b"".join(
+                json.dumps({"event": "property-change", "name": name,
+                            "data": value}).encode() + b"\n"
+                for name, value in props.items()
+            ))
+            # the status waits for the position
+            conn.sendall(position_replies(conn.recv(4096), 5.0))
+
+    def test_session(self):
+        async def main():
+            task = asyncio.create_task(self.mon.run_async())
+            # mpv isn't running yet
+            await asyncio.sleep(0.1)
+            server = socket.socket(socket.AF_UNIX)
+            server.bind(self.ipc_path)
+            server.listen()
+            thread = threading.Thread(target=self.serve, args=(server,), daemon=True)
+            thread.start()
+            while len(self.statuses) < 2:
+                await asyncio.sleep(0.05)
+            task.cancel()
+            server.close()
+            await asyncio.to_thread(thread.join)
+
+        with patch.object(self.mon, "poll_interval", 0.1):
+            asyncio.run(asyncio.wait_for(main(), 5))
+        # playing, then stopped on disconnect
+        self.assertEqual([s["state"] for s in self.statuses],
+                         [State.Playing, State.Stopped])
+        self.assertEqual(self.statuses[0]["position"], 5.0)
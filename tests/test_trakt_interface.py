@@ -0,0 +1,27 @@
+import gc
+import unittest
+from unittest.mock import patch
+
+from trakt_scrobbler import trakt_interface
+from trakt_scrobbler.media_info import MediaInfo
+
+
+class TestIdsCache(unittest.TestCase):
+    def test_weak(self):
+        media_info = MediaInfo(type="movie", title="Uncached Movie", year=2001)
+        ids = {"trakt": 1}
+        calls = []
+        # not a Mock, which would keep a reference to its arguments
+        with patch.object(trakt_interface, "_get_ids",
+                          lambda info: calls.append(1) or ids):
+            self.assertEqual(trakt_interface.get_ids(media_info), ids)
+            self.assertEqual(trakt_interface.get_ids(media_info), ids)
+            self.assertEqual(len(calls), 1)
+            # plain dicts aren't cached
+            trakt_interface.get_ids(dict(media_info))
+            self.assertEqual(len(calls), 2)
+        self.assertIn(media_info, trakt_interface.ids_cache)
+        size = len(trakt_interface.ids_cache)
+        del media_info
+        gc.collect()
+        self.assertEqual(len(trakt_interface.ids_cache), size - 1)
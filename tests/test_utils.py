@@ -0,0 +1,113 @@
+import re
+import threading
+import unittest
+
+from trakt_scrobbler.utils import MultiRegex, Scheduler
+
+from tests.helpers import FakeClock
+
+
+class TestMultiRegex(unittest.TestCase):
+    def assertSameAsSequential(self, patterns, strings):
+        multi = MultiRegex(patterns)
+        for string in strings:
+            expected = None
+            for index, pattern in enumerate(patterns):
+                m = pattern.match(string)
+                if m:
+                    expected = index, m.groupdict()
+                    break
+            result = multi.match(string)
+            if result is not None:
+                result = result[0], result[1].groupdict()
+            self.assertEqual(result, expected, string)
+        return multi
+
+    def test_first_match(self):
+        patterns = [
+            re.compile(r".*/(?P<title>[^/]+) S(?P<season>\d+)E(?P<episode>\d+)"),
+            re.compile(r".*/(?P<title>[^/]+)/(?P<episode>\d+)\.mkv"),
+            re.compile(r"(?i).*/SAMPLE/.*"),
+            re.compile(r"""(?x) .*/trailers/ .*  # ignore trailers"""),
+        ]
+        multi = self.assertSameAsSequential(patterns, [
+            "/tv/Show S01E02.mkv",
+            "/tv/Show/03.mkv",
+            "/tv/Show S01E02/04.mkv",
+            "/tv/sample/Show S01E02.mkv",
+            "/tv/Sample/a.mkv",
+            "/movies/trailers/a.mkv",
+            "/movies/a.mkv",
+        ])
+        self.assertIsNotNone(multi.regex)
+
+    def test_named_backreference(self):
+        patterns = [
+            re.compile(r"(?P<title>\w+)/(?P=title)\.mkv"),
+            re.compile(r"(?P<title>\w+)/.*"),
+        ]
+        multi = self.assertSameAsSequential(patterns, ["abc/abc.mkv", "abc/def.mkv"])
+        self.assertIsNone(multi.regex)
+
+    def test_numbered_backreference(self):
+        patterns = [re.compile(r"(\w+)/\1\.mkv"), re.compile(r"(?P<title>\w+)/.*")]
+        multi = self.assertSameAsSequential(patterns, ["abc/abc.mkv", "abc/def.mkv"])
+        self.assertIsNone(multi.regex)
+
+    def test_empty(self):
+        self.assertIsNone(MultiRegex([]).match("/some/path.mkv"))
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(self.clock, threaded=False)
+        self.calls = []
+
+    def advance(self, seconds):
+        self.clock.now += seconds
+        return self.scheduler.run_due()
+
+    def test_order(self):
+        self.scheduler.schedule(5, self.calls.append, "b")
+        self.scheduler.schedule(2, self.calls.append, "a")
+        self.scheduler.schedule(5, self.calls.append, "c")
+        self.assertEqual(self.advance(1), 1)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.advance(1), 3)
+        self.assertEqual(self.calls, ["a"])
+        self.assertIsNone(self.advance(10))
+        self.assertEqual(self.calls, ["a", "b", "c"])
+
+    def test_pause_resume_cancel(self):
+        handle = self.scheduler.schedule(10, self.calls.append, "a")
+        self.advance(4)
+        handle.pause()
+        self.assertIsNone(self.advance(100))
+        handle.resume()
+        handle.resume()  # no-op while running
+        self.assertEqual(self.advance(5), 1)
+        self.assertEqual(self.calls, [])
+        self.advance(1)
+        self.assertEqual(self.calls, ["a"])
+
+        handle = self.scheduler.schedule(1, self.calls.append, "b")
+        handle.cancel()
+        handle.resume()
+        self.assertIsNone(self.advance(2))
+        self.assertEqual(self.calls, ["a"])
+
+    def test_error(self):
+        self.scheduler.schedule(1, lambda: 1 / 0)
+        self.scheduler.schedule(1, self.calls.append, "a")
+        with self.assertLogs("trakt_scrobbler", "ERROR"):
+            self.advance(1)
+        self.assertEqual(self.calls, ["a"])
+
+    def test_thread(self):
+        scheduler = Scheduler()
+        done = threading.Event()
+        scheduler.schedule(60, done.set)
+        # an earlier deadline wakes up the waiting thread
+        scheduler.schedule(0.01, done.set)
+        self.assertTrue(done.wait(5))
@@ -1,9 +1,10 @@
 import confuse
 import time
-from threading import Timer
+from threading import Event, Thread
 from trakt_scrobbler import config, logger
 from trakt_scrobbler.app_dirs import DATA_DIR
-from trakt_scrobbler.utils import read_json, write_json
+from trakt_scrobbler.media_info import MediaInfo
+from trakt_scrobbler.utils import read_json, scheduler, write_json
 from trakt_scrobbler import trakt_interface as trakt
 
 
@@ -12,10 +13,19 @@ class BacklogCleaner:
 
     def __init__(self, manual=False):
         self.backlog = read_json(self.BACKLOG_PATH) or []
+        for item in self.backlog:
+            item["media_info"] = MediaInfo(item["media_info"])
         self.clear_interval = config["backlog"]["clear_interval"].get(confuse.Number())
         self.expiry = config["backlog"]["expiry"].get(confuse.Number())
         self.timer_enabled = not manual
         if self.timer_enabled:
+            # clearing makes network requests, which would hold up the monitors'
+            # timers if done on the scheduler thread. So the timer only wakes
+            # up this thread to do it.
+            self.wake = Event()
+            self.clear_thread = Thread(target=self._clear_loop, name="backlog-cleaner",
+                                       daemon=True)
+            self.clear_thread.start()
             self._make_timer()
             self.clear()
 
@@ -33,9 +43,13 @@ class BacklogCleaner:
         self.save_backlog()
 
     def _make_timer(self):
-        self.timer = Timer(self.clear_interval, self.clear)
-        self.timer.name = "backlog_cleaner"
-        self.timer.start()
+        self.timer = scheduler.schedule(self.clear_interval, self.wake.set)
+
+    def _clear_loop(self):
+        while True:
+            self.wake.wait()
+            self.wake.clear()
+            self.clear()
 
     def add(self, data):
         self.backlog.append(data)
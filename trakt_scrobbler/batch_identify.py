@@ -0,0 +1,91 @@
+"""
+Run the media identification pipeline over many files at once.
+
+The paths are spread over a pool of worker processes, and the results are
+streamed back in the same order as the input paths.
+"""
+
+import multiprocessing
+import os
+import time
+from typing import Iterable, Iterator
+
+from trakt_scrobbler import logger
+from trakt_scrobbler.filename_parser import VIDEO_EXTENSIONS
+
+
+def walk_paths(paths: Iterable[str]) -> Iterator[str]:
+    """
+    Expand the directories in paths into the video files under them.
+
+    Other paths are passed through as-is, since they may be urls or files with
+    unusual extensions that the user explicitly asked for.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                ext = os.path.splitext(name)[1][1:].lower()
+                if ext in VIDEO_EXTENSIONS:
+                    yield os.path.join(root, name)
+
+
+def identify_one(path: str) -> dict:
+    """
+    Identify a single path, returning the media info with per-stage timings.
+
+    Ambiguous file names are reported in the result's warnings, instead of as
+    notifications, since there could be a lot of them.
+    """
+    # imported here so that the worker processes pay for it, not the parent
+    from trakt_scrobbler.file_info import identify
+
+    timings, warnings = {}, []
+    start = time.perf_counter()
+    try:
+        media_info = identify(path, timings, warnings=warnings)
+        error = None
+    except Exception as e:
+        logger.exception(f"Error while identifying {path!r}")
+        media_info, error = None, f"{type(e).__name__}: {e}"
+    total = time.perf_counter() - start
+    result = {
+        "path": path,
+        "media_info": media_info,
+        "timings_ms": {stage: round(t * 1000, 3) for stage, t in timings.items()},
+        "total_ms": round(total * 1000, 3),
+    }
+    if warnings:
+        result["warnings"] = warnings
+    if error is not None:
+        result["error"] = error
+    return result
+
+
+def _init_worker(log_level):
+    logger.setLevel(log_level)
+
+
+def identify_batch(
+    paths: Iterable[str], workers: int = 0, chunksize: int = 16, log_level=None
+) -> Iterator[dict]:
+    """
+    Identify all the paths, yielding the results of identify_one in input order.
+
+    workers is the number of worker processes, defaulting to the number of CPUs.
+    With workers=1, everything is done in the current process.
+    log_level, if given, is applied to the logger of the workers.
+    """
+    if log_level is None:
+        log_level = logger.level
+    if workers == 1:
+        yield from map(identify_one, paths)
+        return
+    with multiprocessing.Pool(
+        workers or None, initializer=_init_worker, initargs=(log_level,)
+    ) as pool:
+        yield from pool.imap(identify_one, paths, chunksize)
+
@@ -13,3 +13,4 @@ custom_theme = Theme(
 )
 
 console = Console(theme=custom_theme)
+err_console = Console(theme=custom_theme, stderr=True)
@@ -0,0 +1,83 @@
+import json
+import sys
+import time
+from typing import Optional
+
+import typer
+
+from trakt_scrobbler.utils import pluralize
+
+from .console import err_console
+from .utils import add_log_handler, verbosity_level
+
+app = typer.Typer()
+
+
+def read_stdin_paths():
+    for line in sys.stdin:
+        line = line.rstrip("\r\n")
+        if line:
+            yield line
+
+
+@app.command(
+    help="""Identify the media info of files, the way the scrobbler would.
+
+Prints one JSON object per file, with the media info and the time taken by each
+stage of the pipeline (whitelist, exclude, parse, cleanup, remap).
+Directories are searched recursively for video files.
+If no paths are given (or the path is '-'), they are read from stdin.
+"""
+)
+def identify(
+    paths: Optional[list[str]] = typer.Argument(
+        None, help="Files or directories to identify"
+    ),
+    workers: int = typer.Option(
+        0, "--workers", "-j", help="Number of worker processes. 0 means one per CPU."
+    ),
+    chunksize: int = typer.Option(
+        16, help="Number of paths handed to a worker process at once."
+    ),
+    verbose: int = typer.Option(
+        0, "--verbose", "-v", count=True, help="Increase verbosity"
+    ),
+):
+    from trakt_scrobbler import logger
+    from trakt_scrobbler.batch_identify import identify_batch, walk_paths
+    from trakt_scrobbler.media_info import to_json
+
+    add_log_handler(verbose, err_console)
+    # don't flood the log file with debug messages for every single path.
+    # The worker processes inherit this level.
+    logger.setLevel(verbosity_level(verbose))
+
+    if not paths or paths == ["-"]:
+        paths = read_stdin_paths()
+
+    start = time.perf_counter()
+    total = identified = failed = ambiguous = 0
+    for result in identify_batch(walk_paths(paths), workers, chunksize):
+        total += 1
+        identified += result["media_info"] is not None
+        failed += "error" in result
+        ambiguous += "warnings" in result
+        print(json.dumps(result, default=to_json))
+    elapsed = time.perf_counter() - start
+
+    err_console.print(
+        f"Identified {identified} of {total} {pluralize(total, 'file')} "
+        f"in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.1f} files/s).",
+        style="info",
+    )
+    if ambiguous:
+        err_console.print(
+            f"{ambiguous} {pluralize(ambiguous, 'file')} could not be identified "
+            "unambiguously, see the warnings in the output.",
+            style="warning",
+        )
+    if failed:
+        err_console.print(
+            f"{failed} {pluralize(failed, 'file')} raised errors, check the output.",
+            style="error",
+        )
@@ -4,6 +4,7 @@ from . import CMD_NAME
 from .autostart import app as autostart_app
 from .backlog import app as backlog_app
 from .config import app as config_app
+from .identify import app as identify_app
 from .init import app as init_app
 from .log import app as log_app
 from .lookup import app as lookup_app
@@ -29,6 +30,7 @@ app.add_typer(trakt_app)
 app.add_typer(autostart_app, name="autostart")
 app.add_typer(backlog_app, name="backlog")
 app.add_typer(config_app, name="config")
+app.add_typer(identify_app)
 app.add_typer(init_app)
 app.add_typer(log_app, name="log")
 app.add_typer(lookup_app)
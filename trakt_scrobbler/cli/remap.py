@@ -1,8 +1,14 @@
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
 import typer
 
 from trakt_scrobbler.utils import pluralize
 
-from .console import console
+from .console import console, err_console
 from .utils import add_log_handler
 
 app = typer.Typer(help="Operations related to mediainfo remap rules.")
@@ -28,6 +34,15 @@ def print_error_details(err):
     console.print(err["input"])
 
 
+def print_validation_error(e):
+    console.print(
+        f"Got [error]{e.error_count()}[/] validation {pluralize(e.error_count(), 'error')} for [error]{e.title}[/]",
+        style="error",
+    )
+    for err in e.errors(include_context=False):
+        print_error_details(err)
+
+
 @app.command(help="Check for any errors in the remap_rules.toml file.")
 def checkfile(
     verbose: int = typer.Option(
@@ -47,12 +62,7 @@ def checkfile(
     try:
         rules = read_file(REMAP_FILE_PATH)
     except ValidationError as e:
-        console.print(
-            f"Got [error]{e.error_count()}[/] validation {pluralize(e.error_count(), 'error')} for [error]{e.title}[/]",
-            style="error",
-        )
-        for err in e.errors(include_context=False):
-            print_error_details(err)
+        print_validation_error(e)
     else:
         console.print(
             f"Read {len(rules)} {pluralize(len(rules), 'rule')}. All good!",
@@ -68,6 +78,153 @@ def checkfile(
             )
 
 
+def read_guesses(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            guess = json.loads(line)
+            yield guess.pop("path", None), guess
+
+
+def read_guess_files(files):
+    for file in files:
+        with open(file) as f:
+            yield from read_guesses(f)
+
+
+def parse_paths(paths):
+    from trakt_scrobbler.batch_identify import walk_paths
+    from trakt_scrobbler.file_info import parse_media_info
+
+    for path in walk_paths(paths):
+        yield parse_media_info(path)
+
+
+@app.command(
+    name="test",
+    help="""Find out which remap rule applies to each of the given files.
+
+Prints one JSON object per file, with the guess before remapping, the index of the
+rule which applied (if any) and the final media info. Afterwards, a summary of the
+hits per rule, the rules which can never apply, and the throughput is printed.
+
+With --guesses, the inputs are instead JSON objects (one per line) of the parsed
+media info, like {"type": "episode", "title": "Show", "season": 1, "episode": 2},
+with an optional "path" key. This skips the parsing, testing only the rules.
+Directories are searched recursively for video files.
+If no inputs are given (or the input is '-'), they are read from stdin.
+""",
+)
+def test_command(
+    inputs: Optional[list[str]] = typer.Argument(
+        None, help="Files or directories, or files of guesses with --guesses"
+    ),
+    guesses: bool = typer.Option(
+        False, "--guesses", "-g", help="Inputs are JSON guesses instead of paths."
+    ),
+    rules_file: Optional[Path] = typer.Option(
+        None, "--file", "-f", help="Rules file to test, instead of the configured one."
+    ),
+    verbose: int = typer.Option(
+        0, "--verbose", "-v", count=True, help="Increase verbosity"
+    ),
+):
+    from rich.markup import escape
+    from rich.table import Table
+
+    from trakt_scrobbler import logger
+    from trakt_scrobbler.media_info import to_json
+    from trakt_scrobbler.mediainfo_remap import (
+        REMAP_FILE_PATH,
+        RuleIndex,
+        find_shadowed,
+        read_file,
+    )
+
+    from .utils import verbosity_level
+
+    add_log_handler(verbose, err_console)
+    logger.setLevel(verbosity_level(verbose))
+
+    try:
+        if rules_file is None:
+            rules = read_file(REMAP_FILE_PATH)
+        else:
+            # don't replace the cache of the configured rules file
+            rules = read_file(rules_file, cache_file=None)
+    except ValueError as e:
+        # pydantic's ValidationError, imported only if the file had to be validated
+        print_validation_error(e)
+        raise typer.Exit(1)
+    index = RuleIndex(rules)
+
+    if not inputs or inputs == ["-"]:
+        items = read_guesses(sys.stdin) if guesses else parse_paths(
+            line.rstrip("\r\n") for line in sys.stdin if line.strip()
+        )
+    elif guesses:
+        items = read_guess_files(inputs)
+    else:
+        items = parse_paths(inputs)
+
+    hits = [0] * len(rules)
+    total = unidentified = remapped = 0
+    elapsed = 0.0
+    for path, guess in items:
+        total += 1
+        if not guess:
+            unidentified += 1
+            rule_index, media_info = None, guess
+        else:
+            start = time.perf_counter()
+            rule_index, media_info = index.find(path, guess)
+            elapsed += time.perf_counter() - start
+        if rule_index is not None:
+            hits[rule_index] += 1
+            remapped += 1
+        print(json.dumps(
+            {"path": path, "guess": guess, "rule": rule_index, "media_info": media_info},
+            default=to_json,
+        ))
+
+    tested = total - unidentified
+    err_console.print(
+        f"Tested {tested} {pluralize(tested, 'input')} against {len(rules)} "
+        f"{pluralize(len(rules), 'rule')}, {remapped} matched a rule."
+        + (f" {unidentified} could not be identified." if unidentified else ""),
+        style="info",
+    )
+    if tested:
+        err_console.print(
+            f"Rules took {elapsed * 1000:.2f}ms in total, "
+            f"{elapsed / tested * 1e6:.1f}us per input "
+            f"({tested / max(elapsed, 1e-9):.0f} inputs/s).",
+            style="info",
+        )
+
+    if remapped:
+        table = Table("Rule", "Hits", "", title="Rule hits")
+        for i in sorted(range(len(rules)), key=lambda i: -hits[i]):
+            if hits[i]:
+                table.add_row(str(i), str(hits[i]), escape(str(rules[i])))
+        err_console.print(table)
+
+    shadowed = find_shadowed(rules)
+    for i, earlier in shadowed.items():
+        err_console.print(
+            f"[info]Rule {i}[/] can never apply, since [info]rule {earlier}[/] "
+            f"before it matches everything it does:\n\t{escape(str(rules[i]))}",
+            style="error",
+        )
+    unused = [i for i, count in enumerate(hits) if not count and i not in shadowed]
+    if unused and tested:
+        err_console.print(
+            f"{len(unused)} {pluralize(len(unused), 'rule')} didn't match any input: "
+            + ", ".join(map(str, unused)),
+            style="comment",
+        )
+
+
 @app.command(name="open", help="Open the remap rules file in your default editor.")
 def open_command():
     from trakt_scrobbler.mediainfo_remap import REMAP_FILE_PATH
@@ -63,8 +63,8 @@ def wait_for_connection(mon):
 
 def pretty_print_status(status):
     _, data = status
-    media_info = data["media_info"]
-    progress = data["progress"]
+    media_info = data.media_info
+    progress = data.progress
     console.print("Playing ", end="")
     console.print(media_info["title"], style="info", end="")
     if media_info["type"] == "episode":
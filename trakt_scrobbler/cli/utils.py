@@ -95,15 +95,19 @@ def _kill_task_win(pid):
     sp.check_call(["taskkill", "/pid", pid, "/f", "/t"])
 
 
+def verbosity_level(verbose: int) -> int:
+    """Convert the count of --verbose flags into a log level"""
+    if verbose >= 3:
+        return logging.DEBUG
+    elif verbose >= 1:
+        return logging.INFO
+    else:
+        return logging.WARNING
+
+
 def add_log_handler(verbose: int, console):
     """Output the log messages to stdout too"""
     from trakt_scrobbler import logger
 
-    if verbose >= 3:
-        level = logging.DEBUG
-    elif verbose >= 1:
-        level = logging.INFO
-    else:
-        level = logging.WARNING
-    h = RichHandler(level=level, console=console)
+    h = RichHandler(level=verbosity_level(verbose), console=console)
     logger.addHandler(h)
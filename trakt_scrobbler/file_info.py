@@ -1,14 +1,25 @@
+import mimetypes
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
 from functools import lru_cache
-from pathlib import Path
-from typing import Union, List
+from itertools import islice
+from pathlib import Path, PurePath
+from threading import Lock
+from typing import Dict, List, Optional, Tuple, Union
 from urllib.parse import unquote, urlsplit, urlunsplit
 
 import confuse
 import guessit
 from trakt_scrobbler import config, logger
-from trakt_scrobbler.mediainfo_remap import apply_remap_rules
-from trakt_scrobbler.utils import RegexPat, cleanup_encoding, is_url
+from trakt_scrobbler.filename_parser import VIDEO_EXTENSIONS, parse_filename
+from trakt_scrobbler.media_info import MediaInfo
+from trakt_scrobbler.mediainfo_remap import add_reload_listener, apply_remap_rules
+from trakt_scrobbler.utils import MultiRegex, RegexPat, cleanup_encoding, is_url, pluralize
 from urlmatch import BadMatchPattern, urlmatch
+from urlmatch.urlmatch import parse_match_pattern
 
 cfg = config["fileinfo"]
 whitelist = cfg["whitelist"].get(confuse.StrSeq())
@@ -17,7 +28,44 @@ regexes: dict = cfg['include_regexes'].get({
     "episode": confuse.Sequence(RegexPat()),
 })
 use_regex = any(regexes.values())
+fast_parse: bool = cfg["fast_parse"].get(bool)
+skip_non_video: bool = cfg["skip_non_video"].get(bool)
+read_nfo: bool = cfg["read_nfo"].get(bool)
 exclude_patterns: list = cfg["exclude_patterns"].get(confuse.Sequence(RegexPat()))
+exclude_regex = MultiRegex(exclude_patterns)
+# all the include regexes in one engine, keeping track of the type of each pattern
+include_types = [item_type for item_type, pats in regexes.items() for _ in pats]
+include_regex = MultiRegex(pat for pats in regexes.values() for pat in pats)
+
+
+# number of files rejected before being parsed, by reason
+rejection_counts = Counter()
+# audio-only formats. Checked before VIDEO_EXTENSIONS (guessit's list), which
+# has some of these too. Containers that can also hold video, like ogg and mka,
+# are left to the rest of the pipeline.
+AUDIO_EXTENSIONS = frozenset((
+    "aac", "aiff", "alac", "ape", "flac", "m4a", "mp3", "mp4a", "oga", "opus", "ra",
+    "ram", "wav", "wma",
+))
+
+
+def count_rejection(reason: str):
+    rejection_counts[reason] += 1
+    logger.debug(f"Rejected files so far: {dict(rejection_counts)}")
+
+
+def is_non_video(file_path: str) -> bool:
+    """Cheaply check whether the file is some other type of media, like music."""
+    ext = os.path.splitext(file_path)[1][1:].lower()
+    if not ext:
+        # streams and such, can't say
+        return False
+    if ext in AUDIO_EXTENSIONS:
+        return True
+    if ext in VIDEO_EXTENSIONS:
+        return False
+    mimetype, _ = mimetypes.guess_type("file." + ext)
+    return mimetype is not None and mimetype.split("/")[0] in ("audio", "image")
 
 
 def split_whitelist(whitelist: List[str]):
@@ -40,18 +88,78 @@ def split_whitelist(whitelist: List[str]):
     return local, remote
 
 
-local_paths, remote_paths = split_whitelist(whitelist)
+class LocalWhitelist:
+    """
+    Prefix trie over the path components of the local whitelist entries.
+
+    Lookup walks the parent directories of the file once, so it is O(path depth)
+    irrespective of the number of entries.
+    """
+
+    def __init__(self, paths: List[Path]):
+        self.root = {}
+        for index, path in enumerate(paths):
+            node = self.root
+            for part in self.split(path):
+                node = node.setdefault(part, {})
+            # the None key marks a whitelist entry. Store the index so that the
+            # first matching entry (in whitelist order) is reported
+            node.setdefault(None, (index, path))
 
+    @staticmethod
+    def split(path: Path):
+        # normcase takes care of case-insensitive comparisons on windows
+        return map(os.path.normcase, path.parts)
 
-def whitelist_local(local_path: Path, file_path: Path) -> bool:
+    def find(self, file_path: Path) -> Optional[Path]:
+        """Return the whitelist entry which is a parent of file_path, if any."""
+        node = self.root
+        # Path(".") is a parent of all relative paths, but not of absolute ones
+        found = None if file_path.anchor else node.get(None)
+        for part in islice(self.split(file_path), len(file_path.parts) - 1):
+            node = node.get(part)
+            if node is None:
+                break
+            entry = node.get(None)
+            if entry is not None and (found is None or entry[0] < found[0]):
+                found = entry
+        return found[1] if found else None
+
+
+class RemoteWhitelist:
     """
-    Simply checks that the whitelist path should be prefix of file_path.
+    All the remote whitelist patterns compiled into a single regex.
+
+    Each entry is wrapped in a named group, so the match also tells us which
+    entry it came from.
     """
-    return local_path in file_path.parents
 
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        alternatives = []
+        for index, pattern in enumerate(patterns):
+            # an entry can itself be a comma separated list of patterns
+            regex = "|".join(
+                parse_match_pattern(pat.strip(), path_required=False, fuzzy_scheme=True)
+                for pat in pattern.split(",")
+            )
+            alternatives.append(f"(?P<_{index}>{regex})")
+        self.regex = re.compile("|".join(alternatives)) if alternatives else None
+
+    def find(self, url: str) -> Optional[str]:
+        """Return the whitelist pattern matching the url, if any."""
+        if self.regex is None:
+            return None
+        match = self.regex.search(url)
+        if not match:
+            return None
+        # the outer named group is the last one to close
+        return self.patterns[int(match.lastgroup[1:])]
 
-def whitelist_remote(whitelist_path: str, file_path: str) -> bool:
-    return urlmatch(whitelist_path, file_path, path_required=False, fuzzy_scheme=True)
+
+local_paths, remote_paths = split_whitelist(whitelist)
+local_whitelist = LocalWhitelist(local_paths)
+remote_whitelist = RemoteWhitelist(remote_paths)
 
 
 def whitelist_file(file_path: str, is_url=False, return_path=False) -> Union[bool, str]:
@@ -59,43 +167,43 @@ def whitelist_file(file_path: str, is_url=False, return_path=False) -> Union[boo
     if not whitelist:
         return True
     if is_url:
-        is_whitelisted = whitelist_remote    
-        whitelist_paths = remote_paths
+        path = remote_whitelist.find(file_path)
     else:
-        is_whitelisted = whitelist_local
-        whitelist_paths = local_paths
-        file_path = Path(file_path)
+        path = local_whitelist.find(Path(file_path))
 
-    for path in whitelist_paths:
-        if is_whitelisted(path, file_path):
-            logger.debug(f"Matched whitelist entry {path!r}")
-            return str(path) if return_path else True
-
-    return False
+    if path is None:
+        return False
+    logger.debug(f"Matched whitelist entry {path!r}")
+    return str(path) if return_path else True
 
 
 def exclude_file(file_path: str) -> bool:
-    for pattern in exclude_patterns:
-        if pattern.match(file_path):
-            logger.debug(f"Matched exclude pattern {pattern!r}")
-            return True
+    index = exclude_regex.search_index(file_path)
+    if index is not None:
+        logger.debug(f"Matched exclude pattern {exclude_patterns[index]!r}")
+        return True
     return False
 
 
 def custom_regex(file_path: str):
-    for item_type, patterns in regexes.items():
-        for pattern in patterns:
-            m = pattern.match(file_path)
-            if m:
-                logger.debug(f"Matched regex pattern {pattern!r}")
-                guess = m.groupdict()
-                guess['type'] = item_type
-                return guess
+    m = include_regex.match(file_path)
+    if m:
+        index, match = m
+        logger.debug(f"Matched regex pattern {match.re!r}")
+        guess = match.groupdict()
+        guess['type'] = include_types[index]
+        return guess
+
+
+# guessit compiles its rules lazily on first use. Serialize the calls so that a
+# monitor racing with warm_up waits for it instead of compiling them all over again.
+_guessit_lock = Lock()
 
 
 def use_guessit(file_path: str):
     try:
-        return guessit.guessit(file_path)
+        with _guessit_lock:
+            return guessit.guessit(file_path)
     except guessit.api.GuessitException:
         # lazy import the notifier module
         # This codepath will not be executed 99.99% of the time, and importing notify
@@ -107,38 +215,427 @@ def use_guessit(file_path: str):
         return {}
 
 
-@lru_cache(maxsize=None)
-def get_media_info(file_path: str):
-    logger.debug(f"Raw filepath {file_path!r}")
-    file_path = cleanup_encoding(file_path)
-    parsed = urlsplit(file_path)
-    file_is_url = is_url(parsed)
-    guessit_path = file_path
-    if file_is_url:
-        # remove the fragment from the url, keeping only important parts
-        scheme, netloc, path, query, _ = parsed
-        path = unquote(path)  # quoting should only be applied to the path
-        file_path = urlunsplit((scheme, netloc, path, query, ""))
-        logger.debug(f"Converted to url {file_path!r}")
-        # only use the actual path for guessit, skipping other parts
-        guessit_path = path
-        logger.debug(f"Guessit url {guessit_path!r}")
-
-    if not whitelist_file(file_path, file_is_url):
-        logger.info("File path not in whitelist.")
+SEASON_DIR_PAT = re.compile(r"(?i)^(?:season|series|s)[\s._-]*\d{1,3}$")
+# "Show Name (2005)" style folders
+SHOW_DIR_PAT = re.compile(r"^(?P<title>.+?)[\s._]*[(\[](?P<year>(?:19|20)\d{2})[)\]]$")
+
+
+def _normalize_title(title: str) -> str:
+    return re.sub(r"[\W_]+", " ", title).strip().casefold()
+
+
+@lru_cache(maxsize=256)
+def get_dir_context(dir_path: PurePath) -> Optional[dict]:
+    """
+    Infer the show title, season and year from a "Show Name (2019)/Season 02" style
+    directory, so that the files inside it only need their base names parsed.
+    """
+    if len(dir_path.parts) < 2 or not SEASON_DIR_PAT.match(dir_path.name):
         return None
-    if exclude_file(file_path):
-        logger.info("Ignoring file.")
+    guess = use_guessit(str(PurePath(dir_path.parent.name, dir_path.name)))
+    if not isinstance(guess.get('title'), str) or not isinstance(
+        guess.get('season'), int
+    ):
         return None
-    guess = use_regex and custom_regex(file_path) or use_guessit(guessit_path)
-    logger.debug(f"Guess: {guess}")
-    guess = cleanup_guess(guess)
+    title = guess['title']
+    show_dir = dir_path.parent.name
+    match = SHOW_DIR_PAT.match(show_dir)
+    folder_title = re.sub(r"[._]+", " ", match['title'] if match else show_dir).strip()
+    if _normalize_title(folder_title).startswith(_normalize_title(title) + " "):
+        # guessit took the end of the name for something else, like the "Us" of
+        # "The Last of Us" for a country. It doesn't with the whole path.
+        title = folder_title
+    context = {'title': title, 'season': guess['season']}
+    if isinstance(guess.get('year'), int):
+        context['year'] = guess['year']
+    logger.debug(f"Directory context for {dir_path}: {context}")
+    return context
+
+
+def guess_with_context(file_path: str):
+    """
+    Use guessit on the base name only, and fill in the missing info from the
+    directory context. Uses the whole path when there is no context.
+    Returns None for files in a season folder that aren't episodes.
+    """
+    path = PurePath(file_path)
+    context = get_dir_context(path.parent)
+    if context is None:
+        return use_guessit(file_path)
+    guess = dict(use_guessit(path.name))
+    if guess.get('type') != 'episode' or 'episode' not in guess:
+        # not an episode, but in a season folder. Most likely an extra, like a
+        # trailer, which shouldn't be taken for a movie of the same name.
+        logger.debug("Ignoring non-episode file in a season folder")
+        return None
+    if 'title' in guess and 'season' in guess:
+        # something like "Show.Name.S02E03.mkv", the file name has precedence
+        if (
+            'year' in context and 'year' not in guess
+            and str(guess['title']).casefold() == context['title'].casefold()
+        ):
+            guess['year'] = context['year']
+    else:
+        # title-less names like "S02E03.mkv" or "E03 Pilot.mkv"
+        guess['title'] = context['title']
+        guess.setdefault('season', context['season'])
+        if 'year' in context:
+            guess.setdefault('year', context['year'])
+    return guess
+
+
+NFO_ID_TAGS = ("imdb", "tmdb", "tvdb")
+IMDB_ID_PAT = re.compile(r"\btt\d{7,}\b")
+
+
+def parse_nfo(nfo_path: Path) -> Optional[Tuple[str, dict]]:
+    """
+    Read the external ids from a Kodi style .nfo file.
+
+    Returns the kind of the file (movie, tvshow or episodedetails) and the ids
+    (keyed by imdb, tmdb and tvdb), or None if there are no usable ids.
+    """
+    try:
+        text = nfo_path.read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return None
+    # lazy import, most users don't have .nfo files
+    import xml.etree.ElementTree as ET
+
+    try:
+        # Kodi allows a url after the xml, so only parse upto the root's end
+        root = ET.fromstring(text[:text.rfind(">") + 1])
+    except ET.ParseError:
+        # not xml. Could be just a url to the imdb page
+        match = IMDB_ID_PAT.search(text)
+        return ("movie", {"imdb": match[0]}) if match else None
+    ids = {}
+    for elem in root.findall("uniqueid"):
+        id_type = (elem.get("type") or "").lower()
+        if id_type in NFO_ID_TAGS and elem.text and elem.text.strip():
+            ids.setdefault(id_type, elem.text.strip())
+    for id_type in NFO_ID_TAGS:
+        # older formats
+        elem = root.find(f"{id_type}id")
+        if elem is not None and elem.text and elem.text.strip():
+            ids.setdefault(id_type, elem.text.strip())
+    elem = root.find("id")
+    if elem is not None and elem.text and IMDB_ID_PAT.fullmatch(elem.text.strip()):
+        ids.setdefault("imdb", elem.text.strip())
+    if not ids:
+        return None
+    return root.tag, ids
+
+
+def get_dir_nfo_ids(dir_path: Path) -> Dict[str, dict]:
+    """The ids from the movie.nfo and tvshow.nfo files in the directory."""
+    try:
+        mtime = dir_path.stat().st_mtime_ns
+    except OSError:
+        return {}
+    # a new .nfo (like one written by a Kodi scrape) changes the directory's
+    # mtime, so it isn't hidden by a cached miss
+    return _read_dir_nfo_ids(dir_path, mtime)
+
+
+@lru_cache(maxsize=256)
+def _read_dir_nfo_ids(dir_path: Path, mtime: int) -> Dict[str, dict]:
+    found = {}
+    for name in ("movie.nfo", "tvshow.nfo"):
+        nfo = parse_nfo(dir_path / name)
+        if nfo is not None:
+            kind, ids = nfo
+            found[kind] = ids
+    if found:
+        logger.debug(f"Found .nfo ids in {dir_path}: {found}")
+    return found
+
+
+def find_nfo_ids(file_path: str, media_type: str) -> Optional[dict]:
+    """
+    Find the external ids of the media from the sidecar .nfo files.
+
+    For movies, these are "<file name>.nfo" or "movie.nfo" next to the file.
+    For episodes, the show's ids are read from a tvshow.nfo in the directory of
+    the file, or in one of the two directories above (Show/Season 1/file.mkv).
+    """
+    path = Path(file_path)
+    if media_type == "movie":
+        nfo = parse_nfo(path.with_suffix(".nfo"))
+        if nfo is not None and nfo[0] == "movie":
+            return nfo[1]
+        return get_dir_nfo_ids(path.parent).get("movie")
+    for dir_path in islice(path.parents, 3):
+        ids = get_dir_nfo_ids(dir_path).get("tvshow")
+        if ids:
+            return ids
+    return None
+
+
+def add_dir_year(file_path: str, guess: dict) -> dict:
+    """
+    Add the year from the show's folder to a guess made from the base name only,
+    like guessit does with the whole path. The year tells apart remakes of a
+    show with the same title.
+    """
+    if 'year' in guess:
+        return guess
+    parent = PurePath(file_path).parent
+    dirs = (parent, parent.parent) if SEASON_DIR_PAT.match(parent.name) else (parent,)
+    title = _normalize_title(str(guess['title']))
+    for dir_path in dirs:
+        match = SHOW_DIR_PAT.match(dir_path.name)
+        if match and _normalize_title(match['title']) == title:
+            return {**guess, 'year': int(match['year'])}
+    return guess
+
+
+def parse_path(file_path: str):
+    """Guess the media info from the path, taking the fast paths where possible."""
+    if not fast_parse:
+        return use_guessit(file_path)
+    guess = parse_filename(file_path)
+    if guess:
+        return add_dir_year(file_path, guess)
+    return guess_with_context(file_path)
+
+
+def guess_from_tags_and_path(file_path: str, tags_guess: Optional[dict]):
+    """
+    Use the tags guess if there is one, else parse the path.
+
+    Episodes are often tagged with just their own title and air date, which
+    looks like a movie. So a movie guess from the tags is only used if the path
+    doesn't say that it's an episode.
+    """
+    if not tags_guess:
+        return parse_path(file_path)
+    if tags_guess['type'] == 'movie':
+        path_guess = parse_path(file_path)
+        if path_guess and path_guess.get('type') == 'episode':
+            logger.debug("Ignoring the movie tags of an episode")
+            return path_guess
+    return tags_guess
+
+
+@contextmanager
+def _stage(timings: Optional[dict], name: str):
+    """Add the time spent in the block to timings[name]"""
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0) + time.perf_counter() - start
+
+
+def identify(
+    file_path: str,
+    timings: Optional[dict] = None,
+    tags_guess: Optional[dict] = None,
+    warnings: Optional[list] = None,
+):
+    """
+    Run the whole identification pipeline on the file path.
+
+    If timings is provided, the seconds spent in each stage are recorded in it.
+    tags_guess is the guess from the player's metadata (see guess_from_tags).
+    If warnings is provided, the messages about ambiguous file names are added
+    to it, instead of being shown as notifications.
+    """
+    file_path, guess = parse_media_info(file_path, timings, tags_guess, warnings)
     if guess:
-        guess = apply_remap_rules(file_path, guess)
+        with _stage(timings, "remap"):
+            guess = apply_remap_rules(file_path, guess)
     return guess
 
 
-def cleanup_guess(guess):
+def parse_media_info(
+    file_path: str,
+    timings: Optional[dict] = None,
+    tags_guess: Optional[dict] = None,
+    warnings: Optional[list] = None,
+):
+    """
+    Run all the stages of the pipeline except for the remap rules.
+
+    Returns the normalized file path and the cleaned up guess (if any),
+    which are what apply_remap_rules takes.
+    If tags_guess is given, it is used instead of parsing the file path,
+    unless one of the custom include_regexes matches (see guess_from_tags_and_path).
+    """
+    logger.debug(f"Raw filepath {file_path!r}")
+    with _stage(timings, "prefilter"):
+        file_path = cleanup_encoding(file_path)
+        parsed = urlsplit(file_path)
+        file_is_url = is_url(parsed)
+        guessit_path = file_path
+        if file_is_url:
+            # remove the fragment from the url, keeping only important parts
+            scheme, netloc, path, query, _ = parsed
+            path = unquote(path)  # quoting should only be applied to the path
+            file_path = urlunsplit((scheme, netloc, path, query, ""))
+            logger.debug(f"Converted to url {file_path!r}")
+            # only use the actual path for guessit, skipping other parts
+            guessit_path = path
+            logger.debug(f"Guessit url {guessit_path!r}")
+
+        if skip_non_video and is_non_video(guessit_path):
+            logger.info("Ignoring non-video file.")
+            count_rejection("non_video")
+            return file_path, None
+    with _stage(timings, "whitelist"):
+        if not whitelist_file(file_path, file_is_url):
+            logger.info("File path not in whitelist.")
+            count_rejection("not_whitelisted")
+            return file_path, None
+    with _stage(timings, "exclude"):
+        if exclude_file(file_path):
+            logger.info("Ignoring file.")
+            count_rejection("excluded")
+            return file_path, None
+    with _stage(timings, "parse"):
+        guess = use_regex and custom_regex(file_path)
+        if not guess:
+            guess = guess_from_tags_and_path(guessit_path, tags_guess)
+    logger.debug(f"Guess: {guess}")
+    with _stage(timings, "cleanup"):
+        guess = cleanup_guess(guess, warnings)
+    if guess and read_nfo and not file_is_url:
+        with _stage(timings, "nfo"):
+            ids = find_nfo_ids(file_path, guess['type'])
+        if ids:
+            guess = guess.replace(ids=ids)
+    return file_path, guess
+
+
+# (raw file path, tags guess) -> (normalized file path, guess before remapping, media info)
+_media_info_cache: Dict[tuple, Tuple[str, Optional[dict], Optional[dict]]] = {}
+
+
+def get_media_info(file_path: str, tags_guess: Optional[dict] = None):
+    key = file_path, tags_guess and tuple(sorted(tags_guess.items()))
+    try:
+        return _media_info_cache[key][2]
+    except KeyError:
+        pass
+    path, guess = parse_media_info(file_path, tags_guess=tags_guess)
+    media_info = apply_remap_rules(path, guess) if guess else guess
+    _media_info_cache[key] = path, guess, media_info
+    return media_info
+
+
+def _remap_cached(old_rules, new_rules):
+    """Re-apply the remap rules on the cached media infos after a rules reload."""
+    changed = 0
+    for key, (path, guess, media_info) in list(_media_info_cache.items()):
+        if not guess:
+            continue
+        new_info = new_rules.apply(path, guess)
+        if new_info != media_info:
+            _media_info_cache[key] = path, guess, new_info
+            changed += 1
+    if changed:
+        logger.info(f"Remap rules changed the media info of {changed} cached "
+                    f"{pluralize(changed, 'file')}")
+
+
+add_reload_listener(_remap_cached)
+
+
+SHOW_TAGS = ("show", "showname", "tvshow", "series")
+SEASON_TAGS = ("season_number", "seasonnumber", "season")
+EPISODE_TAGS = ("episode_sort", "episodenumber", "episode")
+YEAR_TAG_PAT = re.compile(r"\b((?:19|20)\d\d)\b")
+
+
+def _first_tag(tags: dict, keys):
+    for key in keys:
+        value = tags.get(key)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def _int_tag(tags: dict, keys) -> Optional[int]:
+    value = _first_tag(tags, keys)
+    if value is None:
+        return None
+    try:
+        return int(value.split("/")[0])  # tags like "2/10"
+    except ValueError:
+        return None
+
+
+def guess_from_tags(tags: Optional[dict]) -> Optional[dict]:
+    """
+    Convert the metadata tags of the file reported by the player into a guess.
+
+    Returns None unless the tags fully identify the media: the show, season and
+    episode number for an episode, or the title and year for a movie.
+    The guess is compatible with cleanup_guess.
+    """
+    if not tags:
+        return None
+    tags = {str(key).lower(): value for key, value in tags.items()}
+    show = _first_tag(tags, SHOW_TAGS)
+    if show:
+        season, episode = _int_tag(tags, SEASON_TAGS), _int_tag(tags, EPISODE_TAGS)
+        if season is None or episode is None:
+            return None
+        return {"type": "episode", "title": show, "season": season, "episode": episode}
+    title = _first_tag(tags, ("title",))
+    year = YEAR_TAG_PAT.search(_first_tag(tags, ("date", "year")) or "")
+    if title and year:
+        return {"type": "movie", "title": title, "year": int(year[1])}
+    return None
+
+
+def warm_up():
+    """
+    Run the stages of the pipeline once on a dummy path, so that their one-time
+    initialization (mostly guessit's rule compilation) doesn't delay the first
+    scrobble. The get_media_info cache is left untouched.
+    """
+    timings = {}
+    sample = "/Trakt Scrobbler (2019)/Season 1/Trakt.Scrobbler.S01E02.720p.mkv"
+    start = time.perf_counter()
+    with _stage(timings, "guessit"):
+        use_guessit(sample)
+    with _stage(timings, "regexes"):
+        whitelist_file(sample)
+        exclude_file(sample)
+        if use_regex:
+            custom_regex(sample)
+        parse_filename(sample)
+    with _stage(timings, "remap rules"):
+        apply_remap_rules(None, {"type": "episode", "title": "Trakt Scrobbler",
+                                 "season": 1, "episode": 2})
+    total = time.perf_counter() - start
+    stages = ", ".join(f"{stage} {t:.3f}s" for stage, t in timings.items())
+    logger.info(f"Warm-up done in {total:.3f}s ({stages})")
+
+
+def report_ambiguous(msg: str, warnings: Optional[list] = None, exc_info=False):
+    """
+    Notify the user about a file that couldn't be identified unambiguously.
+
+    If warnings is given (like in batch mode, where there could be hundreds of
+    such files), the message is only added to it instead.
+    """
+    if warnings is not None:
+        logger.debug(msg, exc_info=exc_info)
+        warnings.append(msg)
+        return
+    # lazy import, see use_guessit
+    from trakt_scrobbler.notifier import notify
+    logger.warning(msg, exc_info=exc_info)
+    notify(msg)
+
+
+def cleanup_guess(guess, warnings: Optional[list] = None):
     if not guess:
         return None
 
@@ -158,22 +655,18 @@ def cleanup_guess(guess):
             # if we don't find a season, default to 1
             season = 1  # TODO: Add proper support for absolute-numbered episodes
         if isinstance(season, list):
-            from trakt_scrobbler.notifier import notify
             msg = f"Multiple probable seasons found: ({','.join(map(str, season))}). "
             msg += "Consider renaming the folder."
-            logger.warning(msg)
-            notify(msg)
+            report_ambiguous(msg, warnings)
             return None
         guess['season'] = int(season)
         # if it came from regex, this might be a string
         try:
             guess['episode'] = int(guess['episode'])
         except ValueError:
-            from trakt_scrobbler.notifier import notify
-            msg = f"Couldn't get a integer number episode from {guess['episode']:!r}. "
+            msg = f"Couldn't get a integer number episode from {guess['episode']!r}. "
             msg += "Consider renaming the file(s) or using a custom regex pattern."
-            logger.warning(msg, exc_info=True)
-            notify(msg)
+            report_ambiguous(msg, warnings, exc_info=True)
             return None
         req_keys += ['season', 'episode']
 
@@ -182,4 +675,4 @@ def cleanup_guess(guess):
         guess['year'] = int(guess['year'])
         req_keys += ['year']
 
-    return {key: guess[key] for key in req_keys}
+    return MediaInfo({key: guess[key] for key in req_keys})
@@ -0,0 +1,141 @@
+"""
+A fast-path parser for the most common media file naming conventions.
+
+Files named like "Show.Name.S01E02.720p.mkv" or "Movie Name (2019).mkv" don't need
+the full power of guessit. parse_filename handles such names with a couple of
+regexes, and returns None whenever it isn't confident about the result, in which
+case the caller should fall back to guessit.
+
+The returned dict is compatible with cleanup_guess.
+"""
+
+import re
+from pathlib import PurePath
+from typing import Optional
+
+VIDEO_EXTENSIONS = frozenset((
+    "3g2", "3gp", "3gp2", "asf", "avi", "divx", "flv", "iso", "m4v", "mk2", "mk3d",
+    "mka", "mkv", "mov", "mp4", "mp4a", "mpeg", "mpg", "ogg", "ogm", "ogv", "qt",
+    "ra", "ram", "rm", "ts", "m2ts", "vob", "wav", "webm", "wma", "wmv",
+))
+SEP = r"[\s._-]"
+EPISODE_PAT = re.compile(
+    rf"^(?P<title>.+?){SEP}+"
+    r"(?:[Ss](?P<season>\d{1,2})[Ee](?P<episode>\d{1,3})"
+    r"|(?P<season_x>\d{1,2})[xX](?P<episode_x>\d{2,3}))"
+    rf"(?P<rest>{SEP}.*)?$"
+)
+# greedy title, so that the last year-like token is taken as the year
+MOVIE_PAT = re.compile(
+    rf"^(?P<title>.+){SEP}+"
+    r"(?:\((?P<year_p>(?:19|20)\d\d)\)|(?P<year>(?:19|20)\d\d))"
+    rf"(?P<rest>{SEP}.*)?$"
+)
+TITLE_YEAR_PAT = re.compile(rf"^(?P<title>.+?){SEP}+\(?(?P<year>(?:19|20)\d\d)\)?$")
+TITLE_TOKEN_PAT = re.compile(r"[A-Za-z0-9][A-Za-z0-9'&!]*")
+YEAR_TOKEN_PAT = re.compile(r"(?<![0-9])(?:19|20)\d\d(?![0-9])")
+# things in the trailing part that guessit would treat as more episode numbers
+MULTI_EPISODE_PAT = re.compile(rf"^{SEP}*(?:[EeXx]|[Ss]\d+[Ee])?\d{{1,3}}(?!\d|p)")
+EPISODE_MARKER_PAT = re.compile(r"(?:^|[\s._-])(?:[Ss]\d{1,2}[Ee]\d|\d{1,2}x\d{2})")
+PART_PAT = re.compile(rf"(?:^|{SEP})(?:[Pp]art|[Pp]t|CD|cd)(?:{SEP}|\d|$)")
+# guessit reads "2015.x265" as a screen size of 2015x265
+SCREEN_SIZE_PAT = re.compile(rf"^{SEP}[xX]\d")
+# acronyms like S.H.I.E.L.D
+ACRONYM_PAT = re.compile(r"(?:^|[._ ])[A-Za-z][._][A-Za-z](?:[._]|$)")
+
+# Title tokens that guessit interprets as properties instead of the title.
+# If any of these show up, we let guessit handle the file.
+AMBIGUOUS_TOKENS = frozenset((
+    "us", "uk", "au", "nz", "ca", "extended", "directors", "director's", "cut",
+    "unrated", "remastered", "proper", "repack", "complete", "season", "episode",
+    "part", "pt", "cd", "disc", "dvd", "bluray", "web", "webrip", "hdtv", "x264",
+    "x265", "hevc", "h264", "1080p", "720p", "2160p", "480p", "4k", "imax",
+    "limited", "internal", "dubbed", "subbed", "multi", "french", "german",
+    "spanish", "italian", "english", "hindi", "japanese", "korean", "vostfr",
+    "sample", "trailer", "special", "ova", "ona", "oav",
+))
+
+
+def _clean_title(raw: str) -> Optional[str]:
+    """Convert the raw title portion into words, or None if it looks ambiguous."""
+    raw = raw.strip(" ._-")
+    if not raw or ACRONYM_PAT.search(raw):
+        return None
+    if "(" in raw or ")" in raw or "[" in raw or "]" in raw:
+        return None
+    # dots and underscores are word separators unless spaces are used
+    words = raw.split() if " " in raw else re.split(r"[._]+", raw)
+    words = [w for w in words if w != "-"]
+    if not words:
+        return None
+    for word in words:
+        if not TITLE_TOKEN_PAT.fullmatch(word) or word.lower() in AMBIGUOUS_TOKENS:
+            return None
+    if all(word.isdigit() for word in words):
+        return None
+    return " ".join(words)
+
+
+def _split_title_year(raw: str):
+    m = TITLE_YEAR_PAT.match(raw.strip(" ._-"))
+    if m:
+        return m["title"], int(m["year"])
+    return raw, None
+
+
+def _parse_episode(stem: str) -> Optional[dict]:
+    m = EPISODE_PAT.match(stem)
+    if not m:
+        return None
+    rest = m["rest"] or ""
+    if MULTI_EPISODE_PAT.match(rest) or EPISODE_MARKER_PAT.search(rest):
+        return None
+    if YEAR_TOKEN_PAT.search(rest) or PART_PAT.search(rest):
+        # guessit may pick these up as properties, or as part of the episode title
+        return None
+    raw_title, year = _split_title_year(m["title"])
+    title = _clean_title(raw_title)
+    if title is None or YEAR_TOKEN_PAT.search(title):
+        return None
+    guess = {
+        "type": "episode",
+        "title": title,
+        "season": int(m["season"] or m["season_x"]),
+        "episode": int(m["episode"] or m["episode_x"]),
+    }
+    if year is not None:
+        guess["year"] = year
+    return guess
+
+
+def _parse_movie(stem: str) -> Optional[dict]:
+    if EPISODE_MARKER_PAT.search(stem):
+        # an episode that _parse_episode wasn't confident about
+        return None
+    m = MOVIE_PAT.match(stem)
+    if not m:
+        return None
+    rest = m["rest"] or ""
+    if YEAR_TOKEN_PAT.search(rest) or (m["year"] and SCREEN_SIZE_PAT.match(rest)):
+        return None
+    title = _clean_title(m["title"])
+    if title is None:
+        return None
+    return {"type": "movie", "title": title, "year": int(m["year"] or m["year_p"])}
+
+
+def parse_filename(file_path: str) -> Optional[dict]:
+    """
+    Parse the file name if it follows one of the common conventions.
+
+    Only the base name is looked at. Returns None when not confident.
+    """
+    path = PurePath(file_path)
+    stem, ext = path.stem, path.suffix
+    if ext:
+        if ext[1:].lower() not in VIDEO_EXTENSIONS:
+            # could be part of the name itself
+            stem = path.name
+    elif not stem:
+        return None
+    return _parse_episode(stem) or _parse_movie(stem)
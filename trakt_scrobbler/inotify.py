@@ -0,0 +1,93 @@
+"""
+Minimal inotify bindings through ctypes, for watching config files and sockets.
+
+Only available on Linux. Inotify raises OSError when it can't be used, in which
+case the callers are expected to fall back to polling.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+from typing import List, NamedTuple, Optional
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+_libc = None
+
+
+class Event(NamedTuple):
+    wd: int
+    mask: int
+    name: str
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    return _libc
+
+
+class Inotify:
+    def __init__(self):
+        libc = _get_libc()
+        self.fd = libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def add_watch(self, path, mask: int) -> int:
+        wd = _get_libc().inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(path))
+        return wd
+
+    def read(self, timeout: Optional[float] = None) -> List[Event]:
+        """Wait for upto timeout seconds for events, returning them (if any)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append(Event(wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,10 +1,14 @@
 from queue import Queue
+from threading import Thread
 import confuse
 from trakt_scrobbler import config, logger
 from trakt_scrobbler.backlog_cleaner import BacklogCleaner
+from trakt_scrobbler.file_info import warm_up
 from trakt_scrobbler.log_config import LOG_PATH
+from trakt_scrobbler.mediainfo_remap import watch_rules
 from trakt_scrobbler.notifier import notify
 from trakt_scrobbler.player_monitors import collect_monitors
+from trakt_scrobbler.player_monitors.runtime import MonitorRuntime, supports_async
 from trakt_scrobbler.scrobbler import Scrobbler
 
 
@@ -14,6 +18,12 @@ def main():
     scrobbler = Scrobbler(scrobble_queue, backlog_cleaner)
     scrobbler.start()
 
+    if config['fileinfo']['warm_up'].get(bool):
+        # runs while the monitors are connecting to the players
+        Thread(target=warm_up, name='warm_up', daemon=True).start()
+    if config['fileinfo']['reload_remap_rules'].get(bool):
+        watch_rules()
+
     allowed_monitors = config['players']['monitored'].get(confuse.StrSeq(default=[]))
     all_monitors = collect_monitors()
 
@@ -21,7 +31,9 @@ def main():
     if unknown:
         logger.warning(f"Unknown player(s): {', '.join(unknown)}")
 
+    single_thread = config['players']['single_thread'].get(bool)
     threads = []
+    async_monitors = []
     for Mon in all_monitors:
         if Mon.name not in allowed_monitors:
             continue
@@ -29,8 +41,15 @@ def main():
         if not mon or not mon._initialized:
             logger.warning(f"Could not start monitor for {Mon.name}")
             continue
+        if single_thread and supports_async(mon):
+            async_monitors.append(mon)
+            continue
         mon.start()
         threads.append(mon)
+    if async_monitors:
+        runtime = MonitorRuntime(async_monitors)
+        runtime.start()
+        threads.append(runtime)
 
     for t in threads:
         # will exit when monitors die
@@ -0,0 +1,93 @@
+"""
+Immutable, interned media info.
+
+The media info (type, title, season, episode, year and the ids) of a file is
+passed from the file parsing, through the monitors, to the scrobbler. A
+MediaInfo behaves like a read-only dict. Equal media infos are always the same
+object, so comparing them is an identity check, and they can be used as keys.
+"""
+
+from collections.abc import Mapping
+from threading import Lock
+from weakref import WeakValueDictionary
+
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(value)
+    if isinstance(value, Mapping) and not isinstance(value, MediaInfo):
+        return MediaInfo(value)
+    return value
+
+
+class MediaInfo(Mapping):
+    """
+    A read-only, hashable dict of media info.
+
+    Lists (like the episodes of a multi-episode file) are stored as tuples, and
+    nested dicts (like the external ids) as MediaInfo themselves. Use replace to
+    get a modified copy.
+    """
+
+    __slots__ = ("_data", "_key", "_hash", "__weakref__")
+    _interned = WeakValueDictionary()
+    _lock = Lock()
+
+    def __new__(cls, data=(), **kwargs):
+        if isinstance(data, MediaInfo) and not kwargs:
+            return data
+        frozen = {key: _freeze(value) for key, value in dict(data, **kwargs).items()}
+        key = tuple(sorted(frozen.items()))
+        with cls._lock:
+            self = cls._interned.get(key)
+            if self is None:
+                self = super().__new__(cls)
+                self._data = frozen
+                self._key = key
+                self._hash = hash(key)
+                cls._interned[key] = self
+        return self
+
+    def replace(self, **changes) -> "MediaInfo":
+        return MediaInfo(self._data, **changes)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, MediaInfo):
+            return False  # interned, so equal infos are the same object
+        if isinstance(other, Mapping):
+            return MediaInfo(other) is self
+        return NotImplemented
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        return MediaInfo, (dict(self._data),)
+
+    def __repr__(self):
+        return f"MediaInfo({self._data!r})"
+
+
+def to_json(obj):
+    """json.dump default for the MediaInfo objects in the data"""
+    if isinstance(obj, MediaInfo):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
@@ -2,28 +2,42 @@
 This module contains a parser and applier for mediainfo remap rules.
 
 It should be called at the end of get_media_info.
+
+The rules are validated with the pydantic models in remap_schema. Since that is
+slow to import, the validated rules are cached in a compact JSON form, and
+pydantic is only imported when the rules file has changed.
 """
 
+import hashlib
+import heapq
+import json
+import os
 import re
 import sys
-from copy import deepcopy
+import time
 from enum import Enum
 from pathlib import Path
-from typing import List, Optional, Union
-from pydantic_core import CoreSchema, core_schema
-from pydantic import GetCoreSchemaHandler, field_validator, model_validator
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
-from trakt_scrobbler.utils import pluralize
+from trakt_scrobbler.__version__ import __version__
+from trakt_scrobbler.inotify import (
+    IN_CLOSE_WRITE, IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO, IN_ONLYDIR, Inotify
+)
+from trakt_scrobbler.media_info import MediaInfo
+from trakt_scrobbler.utils import MultiRegex, pluralize
 
 if sys.version_info >= (3, 11):
     import tomllib
 else:
     import tomli as tomllib
-from pydantic import BaseModel, Field
 from trakt_scrobbler import logger
-from trakt_scrobbler.app_dirs import CFG_DIR
+from trakt_scrobbler.app_dirs import CFG_DIR, DATA_DIR
 
 REMAP_FILE_PATH = CFG_DIR / "remap_rules.toml"
+RULES_CACHE_PATH = DATA_DIR / "remap_rules_cache.json"
+# bump when the format of the cached rules changes
+RULES_CACHE_VERSION = 1
 
 
 class NumOrRange:
@@ -53,9 +67,10 @@ class NumOrRange:
         return NumOrRange(self.start + delta, self.end + delta)
 
     @classmethod
-    def __get_pydantic_core_schema__(
-        cls, _source_type, _handler: GetCoreSchemaHandler
-    ) -> CoreSchema:
+    def __get_pydantic_core_schema__(cls, _source_type, _handler):
+        # only called while validating, so pydantic is already imported by then
+        from pydantic_core import core_schema
+
         int_or_str = core_schema.union_schema([
             core_schema.int_schema(ge=0),
             core_schema.str_schema(pattern="^[0-9]+(:[0-9]+)?$"),
@@ -98,28 +113,41 @@ class NumOrRange:
         return f"NumOrRange(start={self.start},end={self.end})"        
 
 
-class RemapMatch(BaseModel, extra='forbid'):
-    path: Optional[re.Pattern] = None
-    episode: Optional[NumOrRange] = None
-    season: Optional[NumOrRange] = None
-    title: Optional[str] = None
-    year: Optional[int] = None
+class MediaType(str, Enum):
+    episode = "episode"
+    movie = "movie"
+
+    def __str__(self) -> str:
+        return "episode" if self == MediaType.episode else "movie"
+
+
+def _num_or_range(val) -> Optional[NumOrRange]:
+    return None if val is None else NumOrRange.validate(val)
+
+
+class RemapMatch:
+    __slots__ = ("path", "episode", "season", "title", "year")
+
+    def __init__(self, path: Optional[re.Pattern] = None,
+                 episode: Optional[NumOrRange] = None,
+                 season: Optional[NumOrRange] = None,
+                 title: Optional[str] = None, year: Optional[int] = None):
+        self.path = path
+        self.episode = episode
+        self.season = season
+        self.title = title
+        self.year = year
 
-    @model_validator(mode='before')
-    @classmethod
-    def check_atleast_one(cls, values):
-        if isinstance(values, dict):
-            assert any(
-                values.get(k) is not None for k in ("path", "title")
-            ), f"Expected either path or title in match. Got {values}"
-        return values
-
-    @field_validator('path')
     @classmethod
-    def path_regex(cls, path):
-        if isinstance(path, str):
-            return re.compile(path)
-        return path
+    def from_dict(cls, data: dict) -> "RemapMatch":
+        path = data.get("path")
+        return cls(
+            path=re.compile(path) if path is not None else None,
+            episode=_num_or_range(data.get("episode")),
+            season=_num_or_range(data.get("season")),
+            title=data.get("title"),
+            year=data.get("year"),
+        )
 
     def match(self, path: Optional[str], guess):
         path_match = None
@@ -157,6 +185,21 @@ class RemapMatch(BaseModel, extra='forbid'):
 
         return path_match.groupdict() if path_match is not None else {}
 
+    def covers(self, other: "RemapMatch") -> bool:
+        """Whether this matches every guess (and path) that other matches"""
+        if self.path is not None and self.path != other.path:
+            return False
+        if self.title is not None and self.title != other.title:
+            return False
+        if self.year is not None and self.year != other.year:
+            return False
+        for mine, theirs in ((self.episode, other.episode), (self.season, other.season)):
+            if mine is not None and (
+                theirs is None or not (mine.match(theirs.start) and mine.match(theirs.end))
+            ):
+                return False
+        return True
+
     def __str__(self):
         s = []
         if self.path is not None:
@@ -171,71 +214,49 @@ class RemapMatch(BaseModel, extra='forbid'):
             s.append(f"year={self.year}")
         return f"RemapMatch({' && '.join(s)})"
 
+    __repr__ = __str__
 
-class TraktId(BaseModel):
-    trakt_id: int
-
-    def __str__(self):
-        return f"trakt_id={self.trakt_id}"
-
-
-class TraktSlug(BaseModel):
-    trakt_slug: str
 
-    def __str__(self):
-        return f"trakt_slug={self.trakt_slug}"
+# the keys of the "id" table of a rule, in the order they are tried by the schema
+ID_KEYS = ("trakt_id", "trakt_slug", "title")
 
 
-class Title(BaseModel):
-    title: str
+class RemapRule:
+    __slots__ = ("match", "media_type", "id_key", "id_value",
+                 "season", "episode", "episode_delta")
 
-    def __str__(self):
-        return f"title={self.title}"
+    def __init__(self, match: RemapMatch, media_type: MediaType, id_key: str,
+                 id_value: Union[int, str], season: Optional[int] = None,
+                 episode: Optional[NumOrRange] = None, episode_delta: int = 0):
+        self.match = match
+        self.media_type = media_type
+        self.id_key = id_key
+        self.id_value = id_value
+        self.season = season
+        self.episode = episode
+        self.episode_delta = episode_delta
 
-
-MediaId = Union[TraktId, TraktSlug, Title]
-
-
-def format(media_id: MediaId, mediainfo) -> MediaId:
-    if isinstance(media_id, TraktId):
-        return TraktId(trakt_id=int(media_id.trakt_id))
-    elif isinstance(media_id, TraktSlug):
-        return TraktSlug(trakt_slug=media_id.trakt_slug.format(**mediainfo))
-    elif isinstance(media_id, Title):
-        return Title(title=media_id.title.format(**mediainfo))
-
-
-class MediaType(str, Enum):
-    episode = "episode"
-    movie = "movie"
-
-    def __str__(self) -> str:
-        return "episode" if self == MediaType.episode else "movie"
-
-
-class RemapRule(BaseModel, extra='forbid'):
-    match: RemapMatch
-    media_type: MediaType = Field(alias="type")
-    media_id: MediaId = Field(alias="id")
-    season: Optional[int] = None
-    episode: Optional[NumOrRange] = None
-    episode_delta: int = 0
-
-    @model_validator(mode='before')
     @classmethod
-    def check_no_ep_with_movie(cls, values):
-        if isinstance(values, dict):
-            if values.get("media_type") == MediaType.movie:
-                assert values.get("season") is None, "Got season in movie rule"
-        return values
+    def from_dict(cls, data: dict) -> "RemapRule":
+        """Create the rule from its validated form (see remap_schema.validate)"""
+        id_key = next(key for key in ID_KEYS if key in data["id"])
+        return cls(
+            match=RemapMatch.from_dict(data["match"]),
+            media_type=MediaType(data["type"]),
+            id_key=id_key,
+            id_value=data["id"][id_key],
+            season=data.get("season"),
+            episode=_num_or_range(data.get("episode")),
+            episode_delta=data.get("episode_delta", 0),
+        )
 
     def apply(self, path: Optional[str], orig_info: dict):
         """If the rule matches, apply it to orig_info and return modified media_info"""
-        media_info = deepcopy(orig_info)
-        match = self.match.match(path, media_info)
+        match = self.match.match(path, orig_info)
         if match is None:
             return None
 
+        media_info = dict(orig_info)
         media_info.update(match)
         media_info['type'] = str(self.media_type)
         if self.media_type == MediaType.episode:
@@ -245,7 +266,7 @@ class RemapRule(BaseModel, extra='forbid'):
             if self.episode is not None:
                 # completely override the episode
                 ep = self.episode.apply_delta(self.episode_delta).to_val()
-            elif isinstance(media_info['episode'], list):
+            elif isinstance(media_info['episode'], (list, tuple)):
                 # got multi-episode file, apply delta to each one
                 ep = [
                     int(epnum) + self.episode_delta for epnum in media_info['episode']
@@ -261,19 +282,19 @@ class RemapRule(BaseModel, extra='forbid'):
                 return None
             media_info['episode'] = ep
 
-        new_id = format(self.media_id, media_info)
-        if isinstance(new_id, TraktId):
-            media_info['trakt_id'] = new_id.trakt_id
-        elif isinstance(new_id, TraktSlug):
-            media_info['trakt_slug'] = new_id.trakt_slug
-        elif isinstance(new_id, Title):
-            media_info['title'] = new_id.title
+        # the rule decides the identity, so ids from .nfo files no longer apply
+        media_info.pop('ids', None)
+        if self.id_key == "trakt_id":
+            media_info['trakt_id'] = int(self.id_value)
+        else:
+            media_info[self.id_key] = self.id_value.format(**media_info)
 
+        media_info = MediaInfo(media_info)
         logger.debug(f"Applied remap rule {self} on {orig_info} to get {media_info}")
         return media_info
 
     def __str__(self):
-        s = [f"type={self.media_type}", f"id.{self.media_id}"]
+        s = [f"type={self.media_type}", f"id.{self.id_key}={self.id_value}"]
         if self.season is not None:
             s.append(f"season={self.season}")
         if self.episode_delta:
@@ -281,42 +302,309 @@ class RemapRule(BaseModel, extra='forbid'):
 
         return f"RemapRule({self.match} -> {{{', '.join(s)}}})"
 
+    __repr__ = __str__
+
+
+def _notify_invalid(file: Path, msg: str):
+    # lazy import
+    from trakt_scrobbler.notifier import notify, Button
+    from trakt_scrobbler.utils import open_file
+    onclick = Button("Open file", on_pressed=lambda: open_file(file))
+    notify(msg, category="exception", actions=[onclick])
+
 
-class RemapFile(BaseModel):
-    rules: List[RemapRule] = Field(default_factory=list)
+def parse_rules(data: dict) -> List[RemapRule]:
+    """
+    Validate the contents of a rules file and compile the rules.
 
+    Raises pydantic.ValidationError (a ValueError) for invalid rules.
+    """
+    from trakt_scrobbler.remap_schema import validate
 
-def read_file(file: Path) -> List[RemapRule]:
+    return [RemapRule.from_dict(rule) for rule in validate(data)]
+
+
+def _read_cache(cache_file: Path) -> Optional[dict]:
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get("version") != RULES_CACHE_VERSION \
+            or cache.get("app_version") != __version__:
+        return None
+    return cache
+
+
+def _write_cache(cache_file: Path, cache: dict):
+    tmp_file = cache_file.with_name(cache_file.name + ".tmp")
     try:
-        with open(file, "rb") as f:
-            data = tomllib.load(f)
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f, separators=(",", ":"))
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        logger.warning(f"Couldn't write the remap rules cache at {cache_file}", exc_info=True)
+
+
+def _load_rules(file: Path, cache_file: Optional[Path] = RULES_CACHE_PATH) -> List[RemapRule]:
+    """
+    Read the rules from the file, using the cached validated rules if possible.
+
+    The cache is reused if either the mtime and size of the file are unchanged,
+    or its contents hash to the same value.
+    """
+    try:
+        stat = file.stat()
     except FileNotFoundError:
         return []
+    cache = _read_cache(cache_file) if cache_file is not None else None
+    if cache and cache.get("path") != str(file):
+        cache = None
+    if cache and cache.get("mtime_ns") == stat.st_mtime_ns \
+            and cache.get("size") == stat.st_size:
+        return [RemapRule.from_dict(rule) for rule in cache["rules"]]
+
+    with open(file, "rb") as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if cache and cache.get("sha256") == digest:
+        rule_dicts = cache["rules"]
+    else:
+        from trakt_scrobbler.remap_schema import validate
+
+        rule_dicts = validate(tomllib.loads(content.decode()))
+    if cache_file is not None:
+        _write_cache(cache_file, {
+            "version": RULES_CACHE_VERSION,
+            "app_version": __version__,
+            "path": str(file),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": digest,
+            "rules": rule_dicts,
+        })
+    return [RemapRule.from_dict(rule) for rule in rule_dicts]
+
+
+def read_file(file: Path, cache_file: Optional[Path] = RULES_CACHE_PATH) -> List[RemapRule]:
+    try:
+        return _load_rules(file, cache_file)
     except tomllib.TOMLDecodeError:
         msg = f"Invalid TOML in remap_rules file at {file}."
         logger.exception(msg)
-        # lazy import
-        from trakt_scrobbler.notifier import notify, Button
-        from trakt_scrobbler.utils import open_file
-        onclick = Button("Open file", on_pressed=lambda: open_file(file))
-        notify(msg, category="exception", actions=[onclick])
+        _notify_invalid(file, msg)
         return []
-    return RemapFile.model_validate(data).rules
 
 
-_rules: Optional[List[RemapRule]] = None
+class RuleIndex:
+    """
+    The remap rules, indexed so that only the ones which could match are evaluated.
+
+    Rules are bucketed by their exact match.title, and the match.path regexes of
+    all rules are combined into one, which tells us the first rule whose path
+    matches. Rules are still tried in file order, so the first matching rule wins.
+    """
+
+    def __init__(self, rules: List[RemapRule]):
+        self.rules = rules
+        self.by_title = {}
+        self.any_title = []
+        # rule index -> position in path_regex
+        self.path_pos = {}
+        path_patterns = []
+        for index, rule in enumerate(rules):
+            if rule.match.title is not None:
+                self.by_title.setdefault(rule.match.title, []).append(index)
+            else:
+                self.any_title.append(index)
+            if rule.match.path is not None:
+                self.path_pos[index] = len(path_patterns)
+                path_patterns.append(rule.match.path)
+        self.path_regex = MultiRegex(path_patterns, fullmatch=True)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def candidates(self, path: Optional[str], media_info: dict):
+        """Yield the indexes of the rules that could match, in order"""
+        title = media_info.get("title")
+        if isinstance(title, str):
+            indexes = heapq.merge(self.by_title.get(title, ()), self.any_title)
+        else:
+            # rules with a title also match when the title is missing
+            indexes = range(len(self.rules))
+        first_path_match = None
+        for index in indexes:
+            pos = self.path_pos.get(index)
+            if pos is not None:
+                if path is None:
+                    continue
+                if first_path_match is None:
+                    first_path_match = self.path_regex.search_index(path)
+                    if first_path_match is None:
+                        first_path_match = len(self.path_pos)
+                if pos < first_path_match:
+                    # the path regex of this rule can't match
+                    continue
+            yield index
+
+    def find(self, path: Optional[str], media_info: dict) -> Tuple[Optional[int], dict]:
+        """Return the index of the rule that applies (if any) and the new media_info"""
+        for index in self.candidates(path, media_info):
+            upd = self.rules[index].apply(path, media_info)
+            if upd is not None:
+                return index, upd
+        return None, media_info  # unchanged
+
+    def apply(self, path: Optional[str], media_info: dict):
+        return self.find(path, media_info)[1]
+
+
+def find_shadowed(rules: List[RemapRule]) -> Dict[int, int]:
+    """
+    Find the rules that can never apply because an earlier rule matches whatever
+    they match. Returns a mapping of the shadowed rule's index to the earlier one's.
+    """
+    shadowed = {}
+    for index, rule in enumerate(rules):
+        for earlier in range(index):
+            if rules[earlier].match.covers(rule.match):
+                shadowed[index] = earlier
+                break
+    return shadowed
+
+
+_rules: Optional[RuleIndex] = None
+_generation = 0  # number of times the rules have been swapped
+_reload_listeners: List[Callable[[Optional[RuleIndex], RuleIndex], None]] = []
+_reload_lock = Lock()
+
+
+def rules_generation() -> int:
+    """Changes whenever the rules are reloaded"""
+    return _generation
+
+
+def add_reload_listener(callback: Callable[[Optional[RuleIndex], RuleIndex], None]):
+    """Register callback(old_rules, new_rules) to be called after the rules change"""
+    _reload_listeners.append(callback)
+
+
+def reload_rules(
+    file: Path = REMAP_FILE_PATH, cache_file: Optional[Path] = RULES_CACHE_PATH
+) -> bool:
+    """
+    Re-read the rules file and swap in the new rules.
+
+    If the file is invalid, the current rules are kept and False is returned.
+    """
+    global _rules, _generation
+    with _reload_lock:
+        try:
+            rules = _load_rules(file, cache_file)
+        except (OSError, ValueError) as e:
+            # ValueError covers both TOMLDecodeError and pydantic's ValidationError
+            msg = f"Invalid remap_rules file at {file}, keeping the previous rules."
+            logger.error(f"{msg}\n{e}")
+            _notify_invalid(file, msg)
+            return False
+        old_rules, _rules = _rules, RuleIndex(rules)
+        _generation += 1
+        logger.info(f"Reloaded {len(rules)} remap {pluralize(len(rules), 'rule')} from {file}")
+        for callback in _reload_listeners:
+            try:
+                callback(old_rules, _rules)
+            except Exception:
+                logger.exception("Error while handling remap rules reload")
+    return True
+
+
+class RulesWatcher(Thread):
+    """
+    Reload the remap rules whenever the file changes.
+
+    Uses inotify on the config directory where available, since editors usually
+    replace the file instead of writing to it. Otherwise, the mtime of the file
+    is polled every poll_interval seconds.
+    """
+
+    # wait for this long after an event for the editor to finish writing
+    SETTLE_DELAY = 0.2
+    INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MOVED_FROM
+
+    def __init__(
+        self,
+        file: Path = REMAP_FILE_PATH,
+        poll_interval: float = 5,
+        cache_file: Optional[Path] = RULES_CACHE_PATH,
+    ):
+        super().__init__(name="RulesWatcher", daemon=True)
+        self.file = file
+        self.cache_file = cache_file
+        self.poll_interval = poll_interval
+        self.last_stat = self._stat()
+
+    def _stat(self):
+        try:
+            st = self.file.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def check(self) -> bool:
+        """Reload the rules if the file changed since the last check"""
+        stat = self._stat()
+        if stat == self.last_stat:
+            return False
+        self.last_stat = stat
+        logger.debug(f"Remap rules file {self.file} changed")
+        reload_rules(self.file, self.cache_file)
+        return True
+
+    def run(self):
+        try:
+            inotify = Inotify()
+            inotify.add_watch(self.file.parent, self.INOTIFY_MASK | IN_ONLYDIR)
+        except OSError as e:
+            logger.debug(f"Can't use inotify for the remap rules file ({e}), polling")
+            self.poll()
+        else:
+            with inotify:
+                self.watch(inotify)
+
+    def poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self.check()
+
+    def watch(self, inotify: Inotify):
+        while True:
+            events = inotify.read()
+            if not any(event.name == self.file.name for event in events):
+                continue
+            # drain the rest of the burst
+            while inotify.read(self.SETTLE_DELAY):
+                pass
+            self.check()
+
+
+def watch_rules(poll_interval: float = 5) -> RulesWatcher:
+    """Start watching the remap rules file for changes"""
+    watcher = RulesWatcher(REMAP_FILE_PATH, poll_interval)
+    watcher.start()
+    return watcher
 
 
 def apply_remap_rules(path: Optional[str], media_info: dict):
     global _rules
-    if _rules is None:
+    rules = _rules
+    if rules is None:
         # read from file on first use
-        _rules = read_file(REMAP_FILE_PATH)
-        if _rules:
-            logger.debug(f"Read {len(_rules)} remap {pluralize(len(_rules), 'rule')} from {REMAP_FILE_PATH}")
-
-    for rule in _rules:
-        upd = rule.apply(path, media_info)
-        if upd is not None:
-            return upd
-    return media_info  # unchanged
+        with _reload_lock:
+            if _rules is None:
+                _rules = RuleIndex(read_file(REMAP_FILE_PATH))
+                if _rules:
+                    logger.debug(f"Read {len(_rules)} remap {pluralize(len(_rules), 'rule')} from {REMAP_FILE_PATH}")
+            rules = _rules
+
+    return rules.apply(path, media_info)
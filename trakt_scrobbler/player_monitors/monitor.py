@@ -1,15 +1,23 @@
+import asyncio
 import time
+from collections import Counter
 from enum import IntEnum
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
 from threading import Lock, Thread
 
 import confuse
 import requests
 from trakt_scrobbler import config, logger
-from trakt_scrobbler.file_info import get_media_info
+from trakt_scrobbler.file_info import count_rejection, get_media_info, guess_from_tags
+from trakt_scrobbler.media_info import MediaInfo
+from trakt_scrobbler.mediainfo_remap import rules_generation
 from trakt_scrobbler.notifier import notify
-from trakt_scrobbler.utils import AutoloadError, ResumableTimer
+from trakt_scrobbler.utils import AutoloadError, TimerHandle, scheduler
 
 SCROBBLE_VERBS = ('stop', 'pause', 'start')
+# progress (in %) above which trakt marks the media as watched when it is stopped
+WATCHED_THRESHOLD = 80
 
 
 class State(IntEnum):
@@ -18,40 +26,69 @@ class State(IntEnum):
     Playing = 2
 
 
+class PlayerState:
+    """The state of the player, as parsed from its status by the monitor."""
+
+    __slots__ = ('state', 'duration', 'progress', 'media_info', 'updated_at')
+
+    def __init__(self, state: State, duration: float, progress: float,
+                 media_info: MediaInfo, updated_at: float):
+        self.state = state
+        self.duration = duration
+        self.progress = progress
+        self.media_info = media_info
+        self.updated_at = updated_at
+
+    def replace(self, **changes) -> "PlayerState":
+        new = object.__new__(PlayerState)
+        for field in self.__slots__:
+            setattr(new, field, changes.get(field, getattr(self, field)))
+        return new
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __eq__(self, other):
+        if not isinstance(other, PlayerState):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field)
+                   for field in self.__slots__)
+
+    def __repr__(self):
+        return f"PlayerState({self.to_dict()!r})"
+
+
 class Transition:
     """Helper class containing common properties of a state change"""
 
     def __init__(self, prev, current):
         self.prev = prev
         self.current = current
-        self._is_same_media = None
 
     def is_state_jump(self, from_: State, to: State) -> bool:
-        return self.prev['state'] == from_ and self.current['state'] == to
+        return self.prev.state == from_ and self.current.state == to
 
     @property
     def from_playing_to_paused(self) -> bool:
-        return (self.prev['state'] == State.Playing and 
-                self.current['state'] == State.Paused)
+        return (self.prev.state == State.Playing and 
+                self.current.state == State.Paused)
 
     @property
     def is_same_media(self) -> bool:
-        # cache this because it is called multiple times and is relatively expensive
-        if self._is_same_media is None:
-            self._is_same_media = self.current['media_info'] == self.prev['media_info']
-        return self._is_same_media
+        # MediaInfo objects are interned
+        return self.current.media_info is self.prev.media_info
 
     @property
     def state_changed(self) -> bool:
-        return self.prev['state'] != self.current['state']
+        return self.prev.state != self.current.state
 
     @property
     def elapsed_realtime(self) -> float:
-        return self.current['updated_at'] - self.prev['updated_at']
+        return self.current.updated_at - self.prev.updated_at
 
     @property
     def progress(self) -> float:
-        return self.current['progress'] - self.prev['progress']
+        return self.current.progress - self.prev.progress
 
     @property
     def abs_progress(self) -> float:
@@ -63,10 +100,10 @@ class Transition:
         Example: duration=50seconds, prev.upd_at=5, cur.upd_at=12
         Here, elapsed time=7s; we expect (12-5)/50=7/50=14% of progress delta
         """
-        if self.prev['duration'] != self.current['duration'] or self.current['state'] != State.Playing:
+        if self.prev.duration != self.current.duration or self.current.state != State.Playing:
             # doesn't make sense to have an expected progress in these cases.
             return 0
-        return 100 * self.elapsed_realtime / self.current['duration']
+        return 100 * self.elapsed_realtime / self.current.duration
 
     @property
     def progress_skipped(self) -> float:
@@ -99,7 +136,21 @@ class Monitor(Thread):
         'fast_pause_threshold': confuse.Number(default=1),
         # in seconds. How long the monitor should wait to start sending scrobbles
         'fast_pause_duration': confuse.Number(default=5),
+        # in seconds. Ignore media shorter than this. 0 to disable
+        'min_duration': confuse.Number(default=0),
+        # in seconds. Poll intervals of the web interface monitors: right after
+        # a state change, while not playing, and the max backoff while unreachable
+        'fast_poll_interval': confuse.Number(default=2),
+        'idle_poll_interval': confuse.Number(default=30),
+        'max_poll_interval': confuse.Number(default=60),
+        # in seconds. Timeouts for connecting to, and waiting for a response from
+        # the web interfaces
+        'connect_timeout': confuse.Number(default=3),
+        'request_timeout': confuse.Number(default=10),
     }
+    # coroutine function used instead of run, when the monitor is run on the
+    # shared event loop of runtime.MonitorRuntime. None if not supported.
+    run_async = None
 
     def __new__(cls, *args, **kwargs):
         try:
@@ -166,38 +217,51 @@ class Monitor(Thread):
         self.preview_duration = self.config['preview_duration']
         self.fast_pause_threshold = self.config['fast_pause_threshold']
         self.fast_pause_duration = self.config['fast_pause_duration']
+        self.min_duration = self.config['min_duration']
         self.is_running = False
         self.status = {}
-        self.prev_state = {}
+        self.prev_state: Optional[PlayerState] = None
         self.preview = False
         self.fast_pause = False
         self.scrobble_buf = None
         self.lock = Lock()
-        self.preview_timer: ResumableTimer = None
-        self.fast_pause_timer: ResumableTimer = None
+        self.preview_timer: TimerHandle = None
+        self.fast_pause_timer: TimerHandle = None
+        self.short_media = None  # the last media ignored for being too short
 
     def can_connect(self) -> bool:
         raise NotImplementedError
 
-    @staticmethod
-    def parse_status(status):
+    def parse_status(self, status) -> Optional[PlayerState]:
         if (
             'filepath' not in status and 'media_info' not in status
         ) or not status.get('duration'):
-            return {}
+            return None
+
+        if status['duration'] < self.min_duration:
+            # checked before parsing, so trailers and samples are cheap to ignore
+            media = status.get('filepath', status.get('media_info'))
+            if media != self.short_media:
+                # counted once per file, like the rejections in file_info
+                logger.debug(f"Ignoring media shorter than {self.min_duration}s")
+                count_rejection("too_short")
+                self.short_media = media
+            return None
 
         if 'filepath' in status:
-            media_info = get_media_info(status['filepath'])
+            # tags from the player, if complete, are used instead of parsing the path
+            tags_guess = guess_from_tags(status.get('tags'))
+            media_info = get_media_info(status['filepath'], tags_guess)
         else:
             media_info = status['media_info']
 
         if media_info is None:
-            return {}
+            return None
+        media_info = MediaInfo(media_info)
 
         ep = media_info.get('episode')
-        if isinstance(ep, list):
-            media_info = media_info.copy()
-            num_eps = len(media_info['episode'])
+        if isinstance(ep, tuple):
+            num_eps = len(ep)
             status['duration'] //= num_eps
             ep_num, status['position'] = divmod(status['position'], status['duration'])
             ep_num = int(ep_num)
@@ -205,18 +269,14 @@ class Monitor(Thread):
             if ep_num == num_eps:
                 ep_num -= 1
                 status['position'] = status['duration']
-            media_info['episode'] = media_info['episode'][ep_num]
+            media_info = media_info.replace(episode=ep[ep_num])
         elif isinstance(ep, str):
-            media_info['episode'] = int(ep)
+            media_info = media_info.replace(episode=int(ep))
 
         progress = min(round(status['position'] * 100 / status['duration'], 2), 100)
-        return {
-            'state': status['state'],
-            'duration': status['duration'],
-            'progress': progress,
-            'media_info': media_info,
-            'updated_at': time.time(),
-        }
+        return PlayerState(
+            status['state'], status['duration'], progress, media_info, time.time()
+        )
 
     def decide_action(self, prev, current):
         """
@@ -230,18 +290,18 @@ class Monitor(Thread):
             not prev
             or not current
             or not transition.is_same_media
-            or prev['state'] == State.Stopped
+            or prev.state == State.Stopped
         ):
             # media changed
             if self.preview:
                 yield 'exit_preview'
-            elif prev and prev['state'] != State.Stopped:
+            elif prev and prev.state != State.Stopped:
                 yield 'stop_previous'
             if self.fast_pause:
                 yield 'exit_fast_pause'
             if current:
-                if current['progress'] > self.preview_threshold:
-                    if current['state'] != State.Stopped:
+                if current.progress > self.preview_threshold:
+                    if current.state != State.Stopped:
                         yield 'enter_preview'
                     else:
                         # Can't really enter_preview on a stopped file
@@ -256,24 +316,24 @@ class Monitor(Thread):
         elif transition.state_changed or transition.abs_progress_skipped > self.skip_interval:
             # state changed
             if self.preview:
-                if current['state'] == State.Stopped:
+                if current.state == State.Stopped:
                     yield 'exit_preview'
                 elif transition.from_playing_to_paused:
                     yield 'pause_preview'
-                elif current['state'] == State.Playing:
+                elif current.state == State.Playing:
                     yield 'resume_preview'
                 else:
                     yield 'invalid_state'
             elif self.fast_pause:
                 if (
-                    current['state'] == State.Stopped
+                    current.state == State.Stopped
                     or transition.abs_progress_skipped > self.skip_interval
                 ):
                     yield 'scrobble'
                     yield 'exit_fast_pause'
-                elif current['state'] == State.Paused:
+                elif current.state == State.Paused:
                     yield 'clear_buf'
-                elif current['state'] == State.Playing:
+                elif current.state == State.Playing:
                     yield 'delayed_play'
             else:  # normal state
                 yield 'scrobble'
@@ -283,8 +343,30 @@ class Monitor(Thread):
                 ):
                     yield 'enter_fast_pause'
 
+    def time_to_boundary(self, state) -> Optional[float]:
+        """
+        Seconds until the next point where the scrobbles may change.
+
+        For a playing state, the progress is extrapolated from the wall-clock time
+        to find when it crosses the preview or watched thresholds, or reaches the
+        end of the file. The preview and fast_pause timers also end there.
+        """
+        delays = []
+        if state and state.state == State.Playing:
+            elapsed = time.time() - state.updated_at
+            progress = state.progress + 100 * elapsed / state.duration
+            for threshold in (self.preview_threshold, WATCHED_THRESHOLD, 100):
+                if progress < threshold:
+                    delays.append((threshold - progress) * state.duration / 100)
+        for timer in (self.preview_timer, self.fast_pause_timer):
+            if timer is not None:
+                time_left = scheduler.time_left(timer)
+                if time_left is not None:
+                    delays.append(time_left)
+        return min(delays, default=None)
+
     def scrobble_status(self, status):
-        verb = SCROBBLE_VERBS[status['state']]
+        verb = SCROBBLE_VERBS[status.state]
         self.scrobble_queue.put((verb, status))
 
     def delayed_scrobble(self, cleanup=None):
@@ -336,10 +418,9 @@ class Monitor(Thread):
                 assert not self.preview and not self.scrobble_buf, "Invalid state"
                 self.preview = True
                 self.scrobble_buf = current
-                self.preview_timer = ResumableTimer(
-                    self.preview_duration, self.delayed_scrobble, (self.exit_preview,)
+                self.preview_timer = scheduler.schedule(
+                    self.preview_duration, self.delayed_scrobble, self.exit_preview
                 )
-                self.preview_timer.start()
             elif action == "pause_preview":
                 self.scrobble_buf = current
                 self.preview_timer.pause()
@@ -355,12 +436,11 @@ class Monitor(Thread):
             elif action == "delayed_play":
                 self.clear_timer('fast_pause_timer')
                 self.scrobble_buf = current
-                self.fast_pause_timer = ResumableTimer(
+                self.fast_pause_timer = scheduler.schedule(
                     self.fast_pause_duration,
                     self.delayed_scrobble,
-                    (self.exit_fast_pause,),
+                    self.exit_fast_pause,
                 )
-                self.fast_pause_timer.start()
             elif action == "exit_fast_pause":
                 self.exit_fast_pause()
             elif action == "ignore":
@@ -375,18 +455,85 @@ class Monitor(Thread):
         self.prev_state = current_state
 
 
+class PooledAdapter(requests.adapters.HTTPAdapter):
+    """
+    A connection pool shared by the web interface monitors talking to the same
+    host, which counts the requests it has sent.
+    """
+
+    def __init__(self, pool_maxsize: int):
+        # one adapter per host, so only a single pool is needed
+        super().__init__(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.counts = Counter()
+
+    def send(self, request, *args, **kwargs):
+        self.counts['requests'] += 1
+        try:
+            return super().send(request, *args, **kwargs)
+        except requests.Timeout:
+            self.counts['timeouts'] += 1
+            raise
+        except requests.ConnectionError:
+            self.counts['errors'] += 1
+            raise
+
+    def stats(self) -> dict:
+        pools = self.poolmanager.pools
+        connections = sum(pools[key].num_connections for key in pools.keys())
+        return {**self.counts, 'connections': connections}
+
+
+_adapters = {}
+_adapters_lock = Lock()
+
+
+def get_adapter(url: str, pool_maxsize: int) -> Tuple[str, PooledAdapter]:
+    """Get the shared adapter for the host of the url, and its mount prefix."""
+    parts = urlsplit(url)
+    prefix = f"{parts.scheme}://{parts.netloc}/".lower()
+    with _adapters_lock:
+        if prefix not in _adapters:
+            _adapters[prefix] = PooledAdapter(pool_maxsize)
+        return prefix, _adapters[prefix]
+
+
 class WebInterfaceMon(Monitor):
     """Base monitor for players with web interfaces that expose its state."""
 
+    # seconds to poll after a boundary, to be sure that it has been crossed
+    BOUNDARY_MARGIN = 0.5
+    # in seconds. How often the poll counts are logged
+    STATS_LOG_INTERVAL = 600
+    # kept-alive connections per host. The requests of a monitor are sequential,
+    # so this is enough for a couple of monitors of the same server.
+    POOL_MAXSIZE = 2
+
     def __init__(self, scrobble_queue):
         super().__init__(scrobble_queue)
         self.sess = requests.Session()
+        prefix, self.adapter = get_adapter(self.URL, self.POOL_MAXSIZE)
+        self.sess.mount(prefix, self.adapter)
+        self.timeout = (self.config['connect_timeout'], self.config['request_timeout'])
         self.poll_interval = self.config['poll_interval']
+        self.fast_poll_interval = min(self.config['fast_poll_interval'],
+                                      self.poll_interval)
+        self.idle_poll_interval = max(self.config['idle_poll_interval'],
+                                      self.poll_interval)
+        self.max_poll_interval = max(self.config['max_poll_interval'],
+                                     self.poll_interval)
+        self.failed_polls = 0  # consecutive polls with the player unreachable
+        # polls where only the position had moved on as expected are 'unchanged'
+        self.poll_counts = Counter()
+        self.stats_logged_at = time.monotonic()
+        self.status_key = None
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.sess.get(url, timeout=self.timeout, **kwargs)
 
     def can_connect(self) -> bool:
         try:
             self.update_status()
-        except requests.ConnectionError:
+        except (requests.ConnectionError, requests.Timeout):
             logger.debug(
                 f'Unable to connect to {self.name}. Ensure that '
                 f'the web interface is running.'
@@ -401,24 +548,125 @@ class WebInterfaceMon(Monitor):
     def update_status(self):
         raise NotImplementedError
 
-    def run(self):
-        while True:
-            try:
-                self.update_status()
-            except requests.ConnectionError:
-                logger.info(
-                    f'Unable to connect to {self.name}. Ensure that '
-                    'the web interface is running.'
-                )
-                self.status = {}
-            except requests.HTTPError as e:
-                logger.error(f"Error while getting data from {self.name}: {e}")
-                notify(f"Error while getting data from {self.name}: {e}",
-                       category="exception")
-                break
-            if not self.status.get("filepath") and not self.status.get("media_info"):
-                self.status = {}
+    def poll(self) -> bool:
+        """Get the status from the player. Returns False if the monitor should stop."""
+        try:
+            self.update_status()
+        except (requests.ConnectionError, requests.Timeout):
+            # a hung player is treated just like one that isn't running
+            self.failed_polls += 1
+            # only log once, the player is usually just not running
+            log = logger.info if self.failed_polls == 1 else logger.debug
+            log(
+                f'Unable to connect to {self.name}. Ensure that '
+                'the web interface is running.'
+            )
+            self.status = {}
+        except requests.HTTPError as e:
+            logger.error(f"Error while getting data from {self.name}: {e}")
+            notify(f"Error while getting data from {self.name}: {e}",
+                   category="exception")
+            return False
+        else:
+            self.failed_polls = 0
+        if not self.status.get("filepath") and not self.status.get("media_info"):
+            self.status = {}
+        return True
+
+    def handle_poll(self) -> float:
+        """Process the polled status, and return the delay until the next poll."""
+        prev = self.prev_state
+        self.poll_counts['total'] += 1
+        status_key = self.get_status_key()
+        if status_key is not None and status_key == self.status_key and \
+                self.update_progress():
+            self.poll_counts['unchanged'] += 1
+        elif self.status or prev:
             self.handle_status_update()
-            time.sleep(self.poll_interval)
+        self.status_key = status_key
+        if time.monotonic() - self.stats_logged_at >= self.STATS_LOG_INTERVAL:
+            self.log_stats()
+        return self.next_poll_delay(prev, self.prev_state)
+
+    def log_stats(self):
+        self.stats_logged_at = time.monotonic()
+        logger.debug(f"{self.name} polls: {dict(self.poll_counts)}, "
+                     f"connections: {self.adapter.stats()}")
+
+    def get_status_key(self):
+        """The fields of the status that need a full evaluation when changed."""
+        status = self.status
+        if not status:
+            return None
+        # after the remap rules are reloaded, the same file can map to other media
+        return (status['state'], status['duration'], status.get('filepath'),
+                status.get('media_info'), status.get('tags'), rules_generation())
+
+    def update_progress(self) -> bool:
+        """
+        Only update the progress of prev_state, if the same media is playing
+        as before, and the position has moved on as expected.
+
+        In that case, decide_action wouldn't have done anything. So the status
+        doesn't have to be parsed and compared again. Returns False if a full
+        evaluation is needed.
+        """
+        prev = self.prev_state
+        duration = self.status['duration']
+        # the duration differs if the file has been split into multiple episodes
+        if not prev or prev.state == State.Stopped or prev.duration != duration:
+            return False
+        now = time.time()
+        progress = min(round(self.status['position'] * 100 / duration, 2), 100)
+        expected = prev.progress
+        if prev.state == State.Playing:
+            expected += 100 * (now - prev.updated_at) / duration
+        if abs(progress - expected) > self.skip_interval:
+            return False
+        self.prev_state = prev.replace(progress=progress, updated_at=now)
+        return True
+
+    def next_poll_delay(self, prev, current) -> float:
+        if self.failed_polls:
+            # exponential backoff while the web interface is unreachable
+            backoff = self.poll_interval * 2 ** (self.failed_polls - 1)
+            return min(backoff, self.max_poll_interval)
+        if current and (
+            not prev
+            or prev.state != current.state
+            or prev.media_info is not current.media_info
+        ):
+            # more changes (like a quick pause/seek) are likely to follow
+            delay = self.fast_poll_interval
+        elif not current or current.state != State.Playing:
+            delay = self.idle_poll_interval
+        else:
+            delay = self.poll_interval
+        boundary = self.time_to_boundary(current)
+        if boundary is not None:
+            delay = min(delay, boundary + self.BOUNDARY_MARGIN)
+        return delay
+
+    def poll_once(self) -> Optional[float]:
+        """Poll and process the status. Returns the delay until the next poll,
+        or None if the monitor should stop."""
+        if not self.poll():
+            return None
+        return self.handle_poll()
+
+    def run(self):
+        while (delay := self.poll_once()) is not None:
+            time.sleep(delay)
+
+        logger.warning(f"{self.name} monitor stopped")
+        self.log_stats()
+
+    async def run_async(self):
+        loop = asyncio.get_running_loop()
+        # the requests and the parsing of the status (guessit) are blocking, so
+        # they are done from the worker threads
+        while (delay := await loop.run_in_executor(None, self.poll_once)) is not None:
+            await asyncio.sleep(delay)
 
         logger.warning(f"{self.name} monitor stopped")
+        self.log_stats()
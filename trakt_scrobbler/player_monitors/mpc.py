@@ -42,7 +42,7 @@ class MPCMon(WebInterfaceMon):
         return {"port": lambda: winreg.QueryValueEx(hkey, key)[0]}
 
     def get_vars(self):
-        response = self.sess.get(self.URL)
+        response = self.get(self.URL)
         text = response.content.decode("utf-8")
         matches = self.PATTERN.findall(text)
         return dict(matches)
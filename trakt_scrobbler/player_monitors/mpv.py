@@ -7,14 +7,20 @@ import appdirs
 import confuse
 from configparser import ConfigParser
 from pathlib import Path
-from queue import Queue
+from queue import Empty, Queue
 from trakt_scrobbler import logger
-from trakt_scrobbler.player_monitors.monitor import Monitor
-from trakt_scrobbler.utils import is_url
+from trakt_scrobbler.player_monitors.monitor import Monitor, State
+from trakt_scrobbler.utils import TimerHandle, is_url, scheduler
 
 if os.name == 'posix':
+    import asyncio
     import select
     import socket
+    from trakt_scrobbler.inotify import (
+        IN_CREATE, IN_DELETE_SELF, IN_IGNORED, IN_MOVE_SELF, IN_MOVED_TO, IN_ONLYDIR,
+        Inotify
+    )
+    from trakt_scrobbler.player_monitors.runtime import wait_readable
 elif os.name == 'nt':
     import win32api
     import win32event
@@ -29,6 +35,15 @@ class MPVMon(Monitor):
     exclude_import = True
     WATCHED_PROPS = frozenset(('pause', 'path', 'working-directory',
                                'duration', 'time-pos'))
+    # not available for every file, so these aren't needed for a status update
+    OPTIONAL_PROPS = frozenset(('metadata',))
+    # pause is last, so that the rest are known when its initial value arrives.
+    # time-pos changes every frame, so instead of being observed, it is fetched
+    # every poll_interval while playing, and before every status update.
+    OBSERVED_PROPS = ('path', 'working-directory', 'metadata', 'duration', 'pause')
+    # changes to these cause a status update
+    STATUS_PROPS = frozenset(('pause', 'duration'))
+    GET_POSITION = ['get_property', 'time-pos']
     CONFIG_TEMPLATE = {
         "ipc_path": confuse.String(default="auto-detect"),
         "poll_interval": confuse.Number(default=10),
@@ -48,13 +63,16 @@ class MPVMon(Monitor):
         self.write_timeout = self.config['write_timeout']
         self.poll_interval = self.config['poll_interval']
         self.restart_delay = self.config['restart_delay']
-        self.buffer: bytes = b''
+        self.buffer = bytearray()  # partial line from the previous read
         self.ipc_lock = threading.Lock()  # for IPC write queue
-        self.poll_timer = None
         self.write_queue = Queue()
         self.sent_commands = {}
         self.command_counter = 1
         self.vars = {}
+        self.status_pending = False  # waiting for time-pos to update the status
+        self.position_time = None  # when time-pos was last received
+        self.position_lock = threading.Lock()
+        self.position_timer: TimerHandle = None
 
     @classmethod
     def read_player_cfg(cls, auto_keys=None):
@@ -77,32 +95,73 @@ class MPVMon(Monitor):
     def run(self):
         while True:
             if self.can_connect():
-                self.update_vars()
+                self.on_connect()
                 self.conn_loop()
-                if self.vars.get('state', 0) != 0:
-                    # create a 'stop' event in case the player didn't send 'end-file'
-                    self.vars['state'] = 0
-                    self.update_status()
-                self.vars = {}
-                if self.poll_timer:
-                    self.poll_timer.cancel()
+                self.on_disconnect()
                 time.sleep(self.restart_delay)
             else:
                 logger.info('Unable to connect to MPV. Check ipc path.')
-                time.sleep(self.poll_interval)
+                self.wait_for_player()
+
+    def on_connect(self):
+        self.observe_props()
+        with self.position_lock:
+            self.position_timer = scheduler.schedule(self.poll_interval,
+                                                     self.poll_position)
+
+    def on_disconnect(self):
+        with self.position_lock:
+            if self.position_timer is not None:
+                self.position_timer.cancel()
+                self.position_timer = None
+        # the queued commands and the pending responses were for the old connection
+        self.take_pending_writes()
+        self.sent_commands.clear()
+        self.status_pending = False
+        if self.vars.get('state', 0) != 0:
+            # create a 'stop' event in case the player didn't send 'end-file'
+            self.vars['state'] = 0
+            self.update_status()
+        self.vars = {}
+        self.position_time = None
+        self.buffer = bytearray()
+
+    def poll_position(self):
+        """Keep time-pos fresh, for the status update of an unexpected stop."""
+        with self.position_lock:
+            if self.position_timer is None:
+                return  # disconnected
+            if self.vars.get('state') == State.Playing:
+                self.send_command(self.GET_POSITION)
+            self.position_timer = scheduler.schedule(self.poll_interval,
+                                                     self.poll_position)
+
+    def request_status(self):
+        """Update the status once mpv has sent the current time-pos."""
+        self.status_pending = True
+        self.send_command(self.GET_POSITION)
+
+    def wait_for_player(self):
+        """Block until it is worth trying to connect to mpv again."""
+        time.sleep(self.poll_interval)
 
     def update_status(self):
-        if not self.WATCHED_PROPS.issubset(self.vars):
-            logger.warning("Incomplete media status info")
+        if 'state' not in self.vars or any(
+            self.vars.get(prop) is None for prop in self.WATCHED_PROPS
+        ):
+            # expected while a file is loading
+            logger.debug("Incomplete media status info")
             return
         fpath = self.vars['path']
         if not is_url(fpath) and not Path(fpath).is_absolute():
             fpath = str(Path(self.vars['working-directory']) / fpath)
 
-        # Update last known position if player is stopped
+        # time-pos is only fetched every poll_interval while playing. For a
+        # stop (which can't be queried), add the time played since then.
         pos = self.vars['time-pos']
-        if self.vars['state'] == 0 and self.status['state'] == 2:
-            pos += round(time.time() - self.status['time'], 3)
+        if self.vars['state'] == 0 and self.status.get('state') == 2 and \
+                self.position_time is not None:
+            pos += round(time.time() - self.position_time, 3)
         pos = min(pos, self.vars['duration'])
 
         self.status = {
@@ -110,81 +169,104 @@ class MPVMon(Monitor):
             'filepath': fpath,
             'position': pos,
             'duration': self.vars['duration'],
+            'tags': self.vars.get('metadata'),
             'time': time.time()
         }
         self.handle_status_update()
 
-    def update_vars(self):
-        """Query mpv for required properties."""
-        self.updated_props_count = 0
-        for prop in self.WATCHED_PROPS:
-            self.send_command(['get_property', prop])
-        if self.poll_timer:
-            self.poll_timer.cancel()
-        self.poll_timer = threading.Timer(self.poll_interval, self.update_vars)
-        self.poll_timer.name = 'mpvpoll'
-        self.poll_timer.start()
-
-    def handle_event(self, event):
-        if event == 'end-file':
-            # Since the player might be shutting down, we can't update vars.
-            # Reuse the previous self.vars and only update the state value.
-            # This might be inaccurate in terms of position, which is why
-            # regular polling is needed
+    def observe_props(self):
+        """Ask mpv to send us the current values and all later changes of the props."""
+        for observe_id, prop in enumerate(self.OBSERVED_PROPS, 1):
+            self.send_command(['observe_property', observe_id, prop])
+
+    def handle_event(self, event, data):
+        if event == 'property-change':
+            self.handle_property_change(data['name'], data.get('data'))
+        elif event == 'end-file':
+            # Since the player might be shutting down, we can't query anything.
+            # Reuse the last known self.vars and only update the state value.
             self.vars['state'] = 0
             self.update_status()
-        elif event == 'pause':
-            self.vars['state'] = 1
-            self.update_vars()
-        elif event == 'unpause' or event == 'playback-restart':
-            self.vars['state'] = 2
-            self.update_vars()
+        elif event == 'playback-restart':
+            # sent once a new file starts playing, and after every seek
+            self.vars['state'] = 1 if self.vars.get('pause') else 2
+            self.request_status()
+
+    def handle_property_change(self, name, value):
+        if value is None and name in self.WATCHED_PROPS:
+            # unavailable while files are switched, keep the last known value
+            # so that the end-file status is complete
+            return
+        prev = self.vars.get(name)
+        self.vars[name] = value
+        if name == 'path' and value != prev:
+            # new file. Wait for its playback-restart, instead of mixing its
+            # path with the position and duration of the previous one.
+            self.vars.pop('time-pos', None)
+            self.vars.pop('duration', None)
+            self.position_time = None
+        elif name == 'pause' and self.vars.get('state') != 0:
+            # when stopped, the state is restored by playback-restart
+            self.vars['state'] = 1 if value else 2
+        if name in self.STATUS_PROPS and value != prev:
+            self.request_status()
 
     def handle_cmd_response(self, resp):
-        command = self.sent_commands.pop(resp['request_id'])
-        if resp['error'] != 'success':
+        command = self.sent_commands.pop(resp['request_id'], None)
+        if command == self.GET_POSITION:
+            # the property is unavailable while no file is loaded
+            if resp['error'] == 'success':
+                self.vars['time-pos'] = resp.get('data')
+                self.position_time = time.time()
+            if self.status_pending:
+                self.status_pending = False
+                self.update_status()
+        elif resp['error'] != 'success':
             logger.error(f'Error with command {command!s}. Response: {resp!s}')
-            return
-        elif command[0] != 'get_property':
-            return
-        param = command[1]
-        data = resp['data']
-        if param == 'pause':
-            self.vars['state'] = 1 if data else 2
-        if param in self.WATCHED_PROPS:
-            self.vars[param] = data
-            self.updated_props_count += 1
-        if self.updated_props_count == len(self.WATCHED_PROPS):
-            self.update_status()
-            # resetting self.vars to {} here is a bad idea.
 
     def on_data(self, data: bytes):
-        self.buffer += data
-        partial_line = b""
-        for line in self.buffer.splitlines(keepends=True):
-            if line.endswith(b"\n"):
-                # no need to strip, json.loads will handle it
+        """Split the data from mpv into lines, and handle the complete ones."""
+        # only the new data is scanned, the buffer never contains a newline
+        end = data.rfind(b"\n")
+        if end < 0:
+            # partial line received, on_line is called in a later data batch
+            self.buffer += data
+            return
+        if self.buffer:
+            self.buffer += memoryview(data)[:end]
+            chunk = self.buffer
+        else:
+            chunk = memoryview(data)[:end]
+        # decode all the complete lines at once
+        lines = str(chunk, encoding='utf-8', errors='ignore').split("\n")
+        self.buffer = bytearray(memoryview(data)[end + 1:])
+        for line in lines:
+            if line:
                 self.on_line(line)
-            else:
-                # partial line received
-                # self.on_line() is called in next data batch
-                partial_line = line
-        self.buffer = partial_line
-
 
-    def on_line(self, line: bytes):
+    def on_line(self, line: str):
         try:
-            line_str = line.decode(encoding='utf-8', errors='ignore')
-            mpv_json = json.loads(line_str)
+            mpv_json = json.loads(line)
         except json.JSONDecodeError:
             logger.warning('Invalid JSON received. Skipping.', exc_info=True)
             logger.debug(line)
             return
         if 'event' in mpv_json:
-            self.handle_event(mpv_json['event'])
+            self.handle_event(mpv_json['event'], mpv_json)
         elif 'request_id' in mpv_json:
             self.handle_cmd_response(mpv_json)
 
+    def take_pending_writes(self) -> bytes:
+        """Remove all the queued commands, returning them joined together."""
+        commands = []
+        while True:
+            try:
+                commands.append(self.write_queue.get_nowait())
+            except Empty:
+                break
+            self.write_queue.task_done()
+        return b"".join(commands)
+
     def send_command(self, elements):
         with self.ipc_lock:
             command = {'command': elements, 'request_id': self.command_counter}
@@ -195,6 +277,8 @@ class MPVMon(Monitor):
 
 class MPVPosixMon(MPVMon):
     exclude_import = os.name != 'posix'
+    # mpv creates the socket file just before it starts listening on it
+    CONNECT_RETRIES = 10
 
     def __init__(self, scrobble_queue):
         super().__init__(scrobble_queue)
@@ -205,6 +289,109 @@ class MPVPosixMon(MPVMon):
         sock.close()
         return errno == 0
 
+    def wait_for_player(self):
+        try:
+            self.wait_for_socket()
+        except OSError as e:
+            # not linux, or the directory of the socket doesn't exist (yet)
+            logger.debug(f"Can't watch for the mpv socket ({e}), polling")
+            time.sleep(self.poll_interval)
+
+    def wait_for_socket(self):
+        """
+        Wait for mpv to create the socket at ipc_path, using inotify.
+
+        Returns once the socket can be connected to, or when the directory
+        containing it goes away. Raises OSError if inotify can't be used.
+        """
+        with self.watch_socket_dir() as inotify:
+            # in case it was created before the watch was added
+            if self.can_connect():
+                return
+            while not self.is_socket_event(inotify.read()):
+                pass
+        for _ in range(self.CONNECT_RETRIES):
+            if self.can_connect():
+                return
+            time.sleep(self.restart_delay)
+
+    def watch_socket_dir(self) -> "Inotify":
+        inotify = Inotify()
+        try:
+            inotify.add_watch(
+                Path(self.ipc_path).parent,
+                IN_CREATE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+            )
+        except OSError:
+            inotify.close()
+            raise
+        return inotify
+
+    def is_socket_event(self, events) -> bool:
+        """Whether the socket was created, or its directory has gone away"""
+        name = Path(self.ipc_path).name
+        return any(event.mask & IN_IGNORED or event.name == name for event in events)
+
+    async def run_async(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.ipc_path)
+            except OSError:
+                logger.info('Unable to connect to MPV. Check ipc path.')
+                await self.wait_for_player_async()
+                continue
+            self.on_connect()
+            try:
+                await self.conn_loop_async(reader, writer)
+            finally:
+                writer.close()
+                self.take_pending_writes()  # discard
+            logger.debug('Sock closed')
+            await asyncio.get_running_loop().run_in_executor(None, self.on_disconnect)
+            await asyncio.sleep(self.restart_delay)
+
+    async def wait_for_player_async(self):
+        try:
+            inotify = self.watch_socket_dir()
+        except OSError as e:
+            logger.debug(f"Can't watch for the mpv socket ({e}), polling")
+            await asyncio.sleep(self.poll_interval)
+            return
+        with inotify:
+            if self.can_connect():
+                return
+            while not self.is_socket_event(inotify.read(0)):
+                await wait_readable(inotify.fd)
+        for _ in range(self.CONNECT_RETRIES):
+            if self.can_connect():
+                return
+            await asyncio.sleep(self.restart_delay)
+
+    async def conn_loop_async(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = self.take_pending_writes()
+            if pending:
+                writer.write(pending)
+                try:
+                    await asyncio.wait_for(writer.drain(), self.write_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning("Timed out writing to socket. Killing connection.")
+                    return
+                except ConnectionError:
+                    return
+            try:
+                # also wakes up regularly for the commands queued by other threads
+                data = await asyncio.wait_for(reader.read(65536), self.read_timeout)
+            except asyncio.TimeoutError:
+                continue
+            except ConnectionError:
+                return
+            if not data:
+                return
+            # the status updates parse the file path, which can block (guessit)
+            await loop.run_in_executor(None, self.on_data, data)
+
     def conn_loop(self):
         sock = socket.socket(socket.AF_UNIX)
         try:
@@ -228,24 +415,20 @@ class MPVPosixMon(MPVMon):
                     self.is_running = False
                     break
                 self.on_data(data)
-            while not self.write_queue.empty():
-                # block until sock can be written to
+            pending = self.take_pending_writes()
+            if pending:
+                # block until sock can be written to, and send all commands at once
                 _, w, _ = select.select([], sock_list, [], self.write_timeout)
                 if not w:
                     logger.warning("Timed out writing to socket. Killing connection.")
                     self.is_running = False
                     break
                 try:
-                    sock.sendall(self.write_queue.get_nowait())
+                    sock.sendall(pending)
                 except BrokenPipeError:
                     self.is_running = False
                     break
-                else:
-                    self.write_queue.task_done()
         sock.close()
-        while not self.write_queue.empty():
-            self.write_queue.get_nowait()
-            self.write_queue.task_done()
         logger.debug('Sock closed')
 
 
@@ -356,9 +539,13 @@ class MPVWinMon(MPVMon):
                     overlapped.hEvent, self.read_timeout)
 
             if err == win32event.WAIT_OBJECT_0:  # data is available
-                data = bytes(data)
-                line = data[:data.find(b"\n")]
-                self.on_line(line)
+                # with observed properties, a read can contain several events
+                num_read = self._call(
+                    win32file.GetOverlappedResult, self.file_handle, overlapped, False
+                )
+                if not self.is_running:
+                    break
+                self.on_data(bytes(data[:num_read]))
 
             while not self.write_queue.empty():
                 # first see if mpv sent some data that needs to be read
@@ -374,7 +561,8 @@ class MPVWinMon(MPVMon):
                 data = self._call(self._transact, write_data)
                 if not self.is_running:
                     break
-                self.on_line(data[:-1])
+                # the response could be preceded by events
+                self.on_data(bytes(data))
 
         self.is_running = False
         self.file_handle.close()
@@ -0,0 +1,179 @@
+"""
+Monitor any number of mpv instances from a single thread.
+
+Each mpv IPC socket gets its own MPVConnection, which is a full MPVMon state
+machine, except that it has no thread of its own. MPVMultiMon owns the sockets
+and dispatches their data from one selector.
+"""
+
+import glob
+import os
+import selectors
+import socket
+import time
+from typing import Dict
+
+import confuse
+from trakt_scrobbler import logger
+from trakt_scrobbler.player_monitors.monitor import Monitor
+from trakt_scrobbler.player_monitors.mpv import MPVMon
+
+CONFIG_TEMPLATE = {
+    # socket paths or glob patterns, like /tmp/mpvsockets/*
+    "ipc_paths": confuse.StrSeq(default=[]),
+    # in seconds. How frequently to look for new sockets
+    "poll_interval": confuse.Number(default=10),
+    # seconds to wait while writing data to mpv
+    "write_timeout": confuse.Number(default=60),
+    # not used, the connections get their path from MPVMultiMon
+    "ipc_path": confuse.String(default=""),
+    # in seconds. Max wait before sending the commands queued by timers
+    "read_timeout": confuse.Number(default=2),
+    "restart_delay": confuse.Number(default=0.1),
+}
+
+
+class MPVConnection(MPVMon):
+    """The state of a single mpv instance, driven by MPVMultiMon."""
+
+    name = 'mpv-multi'
+    exclude_import = True
+    CONFIG_TEMPLATE = CONFIG_TEMPLATE
+
+    def __init__(self, scrobble_queue, ipc_path: str, sock: socket.socket):
+        super().__init__(scrobble_queue)
+        self.ipc_path = ipc_path
+        self.sock = sock
+        self.out_buffer = bytearray()
+        self.last_write = time.monotonic()
+
+    def on_readable(self) -> bool:
+        """Handle the available data. Returns False if the connection is closed."""
+        try:
+            data = self.sock.recv(65536)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        if not data:
+            return False
+        self.on_data(data)
+        return True
+
+    def flush(self) -> bool:
+        """Send as much of the queued commands as possible without blocking."""
+        self.out_buffer += self.take_pending_writes()
+        if not self.out_buffer:
+            self.last_write = time.monotonic()
+            return True
+        try:
+            sent = self.sock.send(self.out_buffer)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            return False
+        if sent:
+            del self.out_buffer[:sent]
+            self.last_write = time.monotonic()
+        elif time.monotonic() - self.last_write > self.write_timeout:
+            logger.warning(f"Timed out writing to {self.ipc_path}. Killing connection.")
+            return False
+        return True
+
+    def on_close(self):
+        self.sock.close()
+        self.on_disconnect()
+
+
+class MPVMultiMon(Monitor):
+    name = 'mpv-multi'
+    exclude_import = os.name != 'posix'
+    CONFIG_TEMPLATE = CONFIG_TEMPLATE
+
+    def __init__(self, scrobble_queue):
+        super().__init__(scrobble_queue)
+        self.ipc_paths = self.config['ipc_paths']
+        self.poll_interval = self.config['poll_interval']
+        self.read_timeout = self.config['read_timeout']
+        self.selector = selectors.DefaultSelector()
+        self.connections: Dict[str, MPVConnection] = {}
+
+    def can_connect(self) -> bool:
+        return bool(self.ipc_paths)
+
+    def find_sockets(self):
+        for pattern in self.ipc_paths:
+            if glob.has_magic(pattern):
+                yield from sorted(glob.glob(pattern))
+            else:
+                yield pattern
+
+    def connect(self, ipc_path: str):
+        sock = socket.socket(socket.AF_UNIX)
+        try:
+            sock.connect(ipc_path)
+        except OSError as e:
+            # usually a leftover socket file of an mpv that has exited
+            logger.debug(f"Unable to connect to mpv at {ipc_path}: {e}")
+            sock.close()
+            return None
+        sock.setblocking(False)
+        conn = MPVConnection(self.scrobble_queue, ipc_path, sock)
+        self.connections[ipc_path] = conn
+        self.selector.register(sock, selectors.EVENT_READ, conn)
+        conn.on_connect()
+        self.update_interest(conn)
+        logger.info(f"Connected to mpv at {ipc_path}")
+        return conn
+
+    def connect_new(self):
+        """Connect to the sockets which aren't connected yet"""
+        for ipc_path in self.find_sockets():
+            if ipc_path not in self.connections:
+                self.connect(ipc_path)
+
+    def disconnect(self, conn: MPVConnection):
+        logger.info(f"Disconnected from mpv at {conn.ipc_path}")
+        self.selector.unregister(conn.sock)
+        del self.connections[conn.ipc_path]
+        conn.on_close()
+
+    def update_interest(self, conn: MPVConnection):
+        """Flush the pending writes, and wait for the socket to be writable if needed"""
+        if not conn.flush():
+            self.disconnect(conn)
+            return
+        events = selectors.EVENT_READ
+        if conn.out_buffer:
+            events |= selectors.EVENT_WRITE
+        self.selector.modify(conn.sock, events, conn)
+
+    def poll(self, timeout: float):
+        """Wait upto timeout seconds for data from the players, and handle it."""
+        if not self.connections:
+            time.sleep(timeout)
+            return
+        ready = set()
+        for key, mask in self.selector.select(min(timeout, self.read_timeout)):
+            conn: MPVConnection = key.data
+            if conn.ipc_path not in self.connections:
+                continue  # closed while handling an earlier event
+            if mask & selectors.EVENT_READ and not conn.on_readable():
+                self.disconnect(conn)
+                continue
+            self.update_interest(conn)
+            ready.add(conn.ipc_path)
+        for conn in list(self.connections.values()):
+            # commands queued from the scheduler thread, like the time-pos polls
+            if conn.ipc_path not in ready and not conn.write_queue.empty():
+                self.update_interest(conn)
+
+    def run(self):
+        if not self.can_connect():
+            logger.warning(f"No ipc_paths configured for {self.name}")
+            return
+        while True:
+            self.connect_new()
+            deadline = time.monotonic() + self.poll_interval
+            while (remaining := deadline - time.monotonic()) > 0:
+                self.poll(remaining)
@@ -167,7 +167,7 @@ class PlexMon(WebInterfaceMon):
         self.media_info_cache = {}
 
     def get_data(self, url):
-        resp = self.sess.get(url)
+        resp = self.get(url)
         # TODO: If we get a 401, clear token and restart plex auth flow
         try:
             resp.raise_for_status()
@@ -0,0 +1,58 @@
+"""
+Run many player monitors as tasks on a single asyncio event loop.
+
+Monitors that define a run_async coroutine are driven from one thread, instead
+of a thread each. Their socket I/O is done on the loop, while blocking calls
+(like the requests made by the web interface monitors, and the parsing of file
+paths in the state handling) go to a small shared pool of worker threads, so
+that one slow monitor doesn't hold up the others. The monitors' state machine
+is the same as for the threaded monitors, and is called for only one event of a
+monitor at a time.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from typing import List
+
+from trakt_scrobbler import logger
+
+
+async def wait_readable(fd):
+    """Wait until the file descriptor has data to be read."""
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    loop.add_reader(fd, ready.set_result, None)
+    try:
+        await ready
+    finally:
+        loop.remove_reader(fd)
+
+
+def supports_async(mon) -> bool:
+    return getattr(mon, "run_async", None) is not None
+
+
+class MonitorRuntime(Thread):
+    """A thread running the event loop that all the given monitors share."""
+
+    def __init__(self, monitors: List, max_workers: int = 4):
+        super().__init__(name="monitors")
+        self.monitors = monitors
+        self.max_workers = max_workers
+
+    def run(self):
+        asyncio.run(self.run_all())
+
+    async def run_all(self):
+        executor = ThreadPoolExecutor(self.max_workers, "monitor-io")
+        asyncio.get_running_loop().set_default_executor(executor)
+        await asyncio.gather(*(self.run_monitor(mon) for mon in self.monitors))
+
+    @staticmethod
+    async def run_monitor(mon):
+        try:
+            await mon.run_async()
+        except Exception:
+            # don't take down the other monitors with it
+            logger.exception(f"Error in {mon.name} monitor")
@@ -45,6 +45,7 @@ class VLCMon(WebInterfaceMon):
         self.sess.auth = ('', web_pwd)
         self.status_url = self.URL + '/requests/status.json'
         self.playlist_url = self.URL + '/requests/playlist.json'
+        self.current_item = None
 
     @classmethod
     def read_player_cfg(cls, auto_keys=None):
@@ -70,7 +71,7 @@ class VLCMon(WebInterfaceMon):
 
     def update_status(self):
         try:
-            status_data = self.sess.get(self.status_url).json()
+            status_data = self.get(self.status_url).json()
         except json.JSONDecodeError:
             raise requests.ConnectionError
         if not status_data['length']:
@@ -79,9 +80,24 @@ class VLCMon(WebInterfaceMon):
         self.status['duration'] = status_data['length']
         self.status['position'] = status_data['time']
         self.status['state'] = self.STATES.index(status_data['state'])
-        self.status['filepath'] = self._get_filepath()
+        # the playlist only needs to be fetched when the current item changes
+        current_item = (status_data.get('currentplid'), status_data['length'])
+        if current_item != self.current_item or 'filepath' not in self.status:
+            self.status['filepath'] = self._get_filepath()
+            self.current_item = current_item if current_item[0] is not None else None
+        self.status['tags'] = self._get_tags(status_data)
+
+    @staticmethod
+    def _get_tags(status_data):
+        # empty objects are sent as lists by VLC
+        meta = status_data.get('information')
+        for key in ('category', 'meta'):
+            if not isinstance(meta, dict):
+                return None
+            meta = meta.get(key)
+        return meta if isinstance(meta, dict) else None
 
     def _get_filepath(self):
-        playlist_data = self.sess.get(self.playlist_url).json()
+        playlist_data = self.get(self.playlist_url).json()
         file_data = search_dict_for_current(playlist_data)
         return file_uri_to_path(file_data['uri'])
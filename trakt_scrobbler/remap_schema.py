@@ -0,0 +1,85 @@
+"""
+Pydantic models for validating the remap_rules.toml file.
+
+These are only needed when the rules file has changed, so this module (and
+pydantic with it) is imported lazily. The validated rules are turned into the
+lightweight objects from mediainfo_remap for actually applying them.
+"""
+
+import re
+from typing import List, Optional, Union
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from trakt_scrobbler.mediainfo_remap import MediaType, NumOrRange
+
+
+class RemapMatch(BaseModel, extra='forbid'):
+    path: Optional[re.Pattern] = None
+    episode: Optional[NumOrRange] = None
+    season: Optional[NumOrRange] = None
+    title: Optional[str] = None
+    year: Optional[int] = None
+
+    @model_validator(mode='before')
+    @classmethod
+    def check_atleast_one(cls, values):
+        if isinstance(values, dict):
+            assert any(
+                values.get(k) is not None for k in ("path", "title")
+            ), f"Expected either path or title in match. Got {values}"
+        return values
+
+    @field_validator('path')
+    @classmethod
+    def path_regex(cls, path):
+        if isinstance(path, str):
+            return re.compile(path)
+        return path
+
+
+class TraktId(BaseModel):
+    trakt_id: int
+
+
+class TraktSlug(BaseModel):
+    trakt_slug: str
+
+
+class Title(BaseModel):
+    title: str
+
+
+MediaId = Union[TraktId, TraktSlug, Title]
+
+
+class RemapRule(BaseModel, extra='forbid'):
+    match: RemapMatch
+    media_type: MediaType = Field(alias="type")
+    media_id: MediaId = Field(alias="id")
+    season: Optional[int] = None
+    episode: Optional[NumOrRange] = None
+    episode_delta: int = 0
+
+    @model_validator(mode='before')
+    @classmethod
+    def check_no_ep_with_movie(cls, values):
+        if isinstance(values, dict):
+            if values.get("media_type") == MediaType.movie:
+                assert values.get("season") is None, "Got season in movie rule"
+        return values
+
+
+class RemapFile(BaseModel):
+    rules: List[RemapRule] = Field(default_factory=list)
+
+
+def validate(data: dict) -> List[dict]:
+    """
+    Validate the contents of a rules file.
+
+    Returns the rules in their canonical form, as plain JSON-compatible dicts.
+    Raises pydantic.ValidationError for invalid rules.
+    """
+    remap_file = RemapFile.model_validate(data)
+    return remap_file.model_dump(mode="json", by_alias=True, exclude_none=True)["rules"]
@@ -39,13 +39,13 @@ class Scrobbler(Thread):
             self.scrobble_queue.task_done()
 
     def filter_scrobble(self, verb, data):
-        return verb in allowed_scrobbles[data['media_info']['type']]
+        return verb in allowed_scrobbles[data.media_info['type']]
 
     def _is_resume(self, verb, media_info):
         if not self.prev_scrobble or verb != "start":
             return False
         prev_verb, prev_data = self.prev_scrobble
-        return prev_verb == "pause" and prev_data['media_info'] == media_info
+        return prev_verb == "pause" and prev_data.media_info is media_info
 
     def _determine_category(self, verb, media_info, trakt_action):
         verb = verb if trakt_action == "scrobble" else trakt_action
@@ -60,7 +60,7 @@ class Scrobbler(Thread):
                     " S{season:02}E{number:02}".format(**resp['episode']))
             url = f"https://trakt.tv/episodes/{resp['episode']['ids']['trakt']}"
 
-        category = self._determine_category(verb, data['media_info'], resp['action'])
+        category = self._determine_category(verb, data.media_info, resp['action'])
         msg = f"Scrobble {category} successful for {name} at {resp['progress']:.2f}%"
 
         logger.info(msg)
@@ -73,14 +73,14 @@ class Scrobbler(Thread):
         self.backlog_cleaner.clear()
 
     def scrobble(self, verb, data):
-        logger.debug(f"Scrobbling {verb} at {data['progress']:.2f}% for "
-                     f"{data['media_info']['title']}")
-        resp = trakt.scrobble(verb, **data)
+        logger.debug(f"Scrobbling {verb} at {data.progress:.2f}% for "
+                     f"{data.media_info['title']}")
+        resp = trakt.scrobble(verb, data.media_info, data.progress)
         if resp:
             self.handle_successful_scrobble(verb, data, resp)
-        elif resp is False and verb == 'stop' and data['progress'] > 80:
+        elif resp is False and verb == 'stop' and data.progress > 80:
             logger.warning('Scrobble unsuccessful. Will try again later.')
-            self.backlog_cleaner.add(data)
+            self.backlog_cleaner.add(data.to_dict())
         else:
             logger.warning('Scrobble unsuccessful. Discarding it.')
         self.prev_scrobble = (verb, data)
@@ -1,7 +1,9 @@
 from datetime import datetime as dt
 from http import HTTPStatus
+from weakref import WeakKeyDictionary
 from trakt_scrobbler import logger
 from trakt_scrobbler.app_dirs import DATA_DIR
+from trakt_scrobbler.media_info import MediaInfo
 from trakt_scrobbler.notifier import notify
 from trakt_scrobbler.trakt_auth import API_URL, TraktAuth
 from trakt_scrobbler.utils import safe_request, read_json, write_json
@@ -9,6 +11,9 @@ from trakt_scrobbler.utils import safe_request, read_json, write_json
 trakt_auth = TraktAuth()
 TRAKT_CACHE_PATH = DATA_DIR / 'trakt_cache.json'
 trakt_cache = {}
+# MediaInfo -> the trakt ids found for it. Weak, so that the entries go away
+# along with the interned MediaInfo once nothing else uses it.
+ids_cache = WeakKeyDictionary()
 
 
 def search(query, types=None, year=None, extended=False, page=1, limit=1):
@@ -26,13 +31,55 @@ def search(query, types=None, year=None, extended=False, page=1, limit=1):
     return r.json() if r else None
 
 
-def get_trakt_id(title, item_type, year=None):
-    required_type = 'show' if item_type == 'episode' else 'movie'
+def lookup_id(id_type, media_id, item_type):
+    """Find the trakt item with the given external (imdb, tmdb or tvdb) id"""
+    params = {
+        "url": f"{API_URL}/search/{id_type}/{media_id}",
+        "params": {'type': item_type},
+        "headers": trakt_auth.headers,
+        "timeout": 30,
+    }
+    r = safe_request('get', params)
+    return r.json() if r else None
+
 
+def load_trakt_cache():
     global trakt_cache
     if not trakt_cache:
         trakt_cache = read_json(TRAKT_CACHE_PATH) or {'movie': {}, 'show': {}}
 
+
+def get_trakt_id_from_ids(ids, item_type):
+    """
+    Get the trakt id through an exact lookup of the external ids (from .nfo files).
+
+    Returns 0 for connection errors, and None if none of the ids are on trakt.
+    """
+    required_type = 'show' if item_type == 'episode' else 'movie'
+    load_trakt_cache()
+    for id_type, media_id in ids.items():
+        key = f"{id_type}:{media_id}"
+        trakt_id = trakt_cache[required_type].get(key)
+        if trakt_id is None:
+            logger.debug(f'Looking up trakt {required_type} with {id_type} id {media_id}')
+            results = lookup_id(id_type, media_id, required_type)
+            if results is None:  # Connection error
+                return 0
+            trakt_id = results[0][required_type]['ids']['trakt'] if results else -1
+            trakt_cache[required_type][key] = trakt_id
+            write_json(trakt_cache, TRAKT_CACHE_PATH)
+        if trakt_id > 0:
+            logger.debug(f'Trakt ID: {trakt_id}')
+            return trakt_id
+    logger.warning(f"No trakt {required_type} found for the ids {ids}, searching by title")
+    return None
+
+
+def get_trakt_id(title, item_type, year=None):
+    required_type = 'show' if item_type == 'episode' else 'movie'
+
+    load_trakt_cache()
+
     key = f"{title}{year or ''}"
 
     trakt_id = trakt_cache[required_type].get(key)
@@ -67,14 +114,29 @@ def get_trakt_id(title, item_type, year=None):
 
 
 def get_ids(media_info):
+    try:
+        return ids_cache[media_info]
+    except (KeyError, TypeError):  # TypeError for plain dicts
+        pass
+    ids = _get_ids(media_info)
+    if ids and isinstance(media_info, MediaInfo):
+        ids_cache[media_info] = ids
+    return ids
+
+
+def _get_ids(media_info):
     try:
         trakt_id = media_info['trakt_id']
     except KeyError:
         try:
             trakt_slug = media_info['trakt_slug']
         except KeyError:
-            title = media_info["title"]
-            trakt_id = get_trakt_id(title, media_info['type'], media_info.get('year'))
+            trakt_id = None
+            if media_info.get('ids'):
+                trakt_id = get_trakt_id_from_ids(media_info['ids'], media_info['type'])
+            if trakt_id is None:
+                title = media_info["title"]
+                trakt_id = get_trakt_id(title, media_info['type'], media_info.get('year'))
         else:
             return {'slug': trakt_slug}
     if trakt_id == 0:
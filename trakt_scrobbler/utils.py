@@ -1,3 +1,5 @@
+import heapq
+import itertools
 import json
 import locale
 import logging.config
@@ -7,7 +9,7 @@ import subprocess as sp
 import sys
 import threading
 import time
-from typing import Iterable, Union
+from typing import Iterable, Optional, Tuple, Union
 from functools import lru_cache, singledispatch
 from urllib.parse import ParseResult, urlparse
 from urllib.request import url2pathname
@@ -17,6 +19,7 @@ import requests
 from requests.exceptions import RetryError
 from urllib3.util.retry import Retry
 from trakt_scrobbler import config
+from trakt_scrobbler.media_info import to_json
 
 logger = logging.getLogger('trakt_scrobbler')
 
@@ -50,7 +53,7 @@ def read_json(file_path):
 
 def write_json(data, file_path):
     with open(file_path, 'w') as f:
-        json.dump(data, f, indent=4)
+        json.dump(data, f, indent=4, default=to_json)
 
 
 def safe_request(verb, params, sess=init_sess()):
@@ -153,36 +156,151 @@ def pluralize(num: Union[int, Iterable], singular: str, plural: str = None) -> s
     return f"{singular if num == 1 else plural}"
 
 
-class ResumableTimer:
-    def __init__(self, timeout, callback, args=None, kwargs=None):
-        self.timeout = timeout
+class TimerHandle:
+    """A callback scheduled to run on a Scheduler, after a delay."""
+
+    __slots__ = ("scheduler", "callback", "args", "kwargs", "deadline", "remaining",
+                 "seq", "cancelled")
+
+    def __init__(self, scheduler, callback, args, kwargs):
+        self.scheduler = scheduler
         self.callback = callback
         self.args = args
         self.kwargs = kwargs
-        self.timer = threading.Timer(timeout, callback, args, kwargs)
+        self.deadline = None
+        self.remaining = None  # set while paused
+        self.seq = None  # of the heap entry currently valid for this handle
+        self.cancelled = False
 
-    def start(self):
-        self.start_time = time.time()
-        self.timer.start()
+    @property
+    def paused(self) -> bool:
+        return self.remaining is not None
 
     def pause(self):
-        self.timer.cancel()
-        self.timer = None
-        self.pause_time = time.time()
+        self.scheduler.pause(self)
 
     def resume(self):
-        if self.timer:
-            # don't resume if already running
-            return
-        # reduce the timeout by num of seconds for which timer was active
-        self.timeout -= self.pause_time - self.start_time
-        self.timer = threading.Timer(
-            self.timeout, self.callback, self.args, self.kwargs)
-        self.start()
+        self.scheduler.resume(self)
 
     def cancel(self):
-        if self.timer is not None:
-            self.timer.cancel()
+        self.scheduler.cancel(self)
+
+
+class Scheduler:
+    """
+    Run callbacks after a delay, all from a single thread.
+
+    The pending callbacks are kept in a heap ordered by deadline. Pausing or
+    cancelling a handle doesn't remove its heap entry, the entry is just skipped
+    once it comes up. The callbacks run on the scheduler's thread, so they should
+    be quick; a slow callback delays the ones after it.
+
+    With threaded=False, no thread is started, and the due callbacks are only run
+    by explicit calls to run_due. Together with a fake clock, this makes the
+    timing deterministic for tests.
+    """
+
+    def __init__(self, clock=time.monotonic, threaded=True, name="scheduler"):
+        self.clock = clock
+        self.threaded = threaded
+        self.name = name
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, delay: float, callback, *args, **kwargs) -> TimerHandle:
+        handle = TimerHandle(self, callback, args, kwargs)
+        with self._cond:
+            self._push(handle, self.clock() + delay)
+        return handle
+
+    def pause(self, handle: TimerHandle):
+        with self._cond:
+            if handle.cancelled or handle.paused:
+                return
+            handle.remaining = max(handle.deadline - self.clock(), 0)
+            handle.seq = None
+
+    def resume(self, handle: TimerHandle):
+        with self._cond:
+            if handle.cancelled or not handle.paused:
+                # don't resume if already running
+                return
+            remaining, handle.remaining = handle.remaining, None
+            self._push(handle, self.clock() + remaining)
+
+    def cancel(self, handle: TimerHandle):
+        with self._cond:
+            handle.cancelled = True
+            handle.seq = None
+
+    def time_left(self, handle: TimerHandle) -> Optional[float]:
+        """Seconds until the callback runs, or None if it isn't pending."""
+        with self._cond:
+            if handle.seq is None:
+                return None
+            return max(handle.deadline - self.clock(), 0)
+
+    def _push(self, handle: TimerHandle, deadline: float):
+        handle.deadline = deadline
+        handle.seq = next(self._counter)
+        heapq.heappush(self._heap, (deadline, handle.seq, handle))
+        if self.threaded:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def _pop_due(self) -> Tuple[Optional[TimerHandle], Optional[float]]:
+        """Pop the first due handle, or return the time until the next deadline."""
+        while self._heap:
+            deadline, seq, handle = self._heap[0]
+            if handle.seq != seq:
+                heapq.heappop(self._heap)  # paused, cancelled or rescheduled
+                continue
+            delay = deadline - self.clock()
+            if delay > 0:
+                return None, delay
+            heapq.heappop(self._heap)
+            handle.seq = None
+            return handle, None
+        return None, None
+
+    def run_due(self) -> Optional[float]:
+        """
+        Run the callbacks whose deadline has passed.
+
+        Returns the time until the next deadline, or None if nothing is pending.
+        """
+        while True:
+            with self._cond:
+                handle, delay = self._pop_due()
+            if handle is None:
+                return delay
+            self._call(handle)
+
+    @staticmethod
+    def _call(handle: TimerHandle):
+        try:
+            handle.callback(*handle.args, **handle.kwargs)
+        except Exception:
+            logger.exception(f"Error in scheduled callback {handle.callback!r}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                handle, delay = self._pop_due()
+                while handle is None:
+                    # woken up early by _push when an earlier deadline is added
+                    self._cond.wait(delay)
+                    handle, delay = self._pop_due()
+            self._call(handle)
+
+
+scheduler = Scheduler()
 
 
 class RegexPat(confuse.Template):
@@ -200,6 +318,85 @@ class RegexPat(confuse.Template):
                       view, type_error=True)
 
 
+class MultiRegex:
+    """
+    Match a string against a list of regexes in a single scan.
+
+    The patterns are combined into one alternation, so the first pattern (in list
+    order) that matches wins, just like calling pattern.match on each of them in
+    turn. Named groups are made non-capturing in the combined regex (saving their
+    marks on every backtrack is expensive), and each alternative is tagged with an
+    empty named group to know which pattern matched. Only that pattern is then run
+    again to extract its groups.
+
+    Patterns that cannot be safely combined (like those using backreferences)
+    make it fall back to trying the patterns one by one.
+
+    With fullmatch=True, the patterns have to match the whole string, like
+    pattern.fullmatch.
+    """
+
+    NAMED_GROUP_PAT = re.compile(r"\(\?P<\w+>")
+    GLOBAL_FLAGS_PAT = re.compile(r"^\(\?[aiLmsux]+\)")
+    UNSAFE_PAT = re.compile(r"\\[1-9]|\(\?\(|\(\?P=")
+    SCOPED_FLAGS = {
+        re.IGNORECASE: "i", re.MULTILINE: "m", re.DOTALL: "s", re.VERBOSE: "x"
+    }
+
+    def __init__(self, patterns: Iterable[re.Pattern], fullmatch: bool = False):
+        self.patterns = list(patterns)
+        self.fullmatch = fullmatch
+        try:
+            self.regex = self._combine()
+        except (re.error, ValueError) as e:
+            logger.debug(f"Couldn't combine regexes, will match one by one: {e}")
+            self.regex = None
+
+    def _combine(self):
+        if not self.patterns:
+            return None
+        alternatives = []
+        for index, pattern in enumerate(self.patterns):
+            if (
+                pattern.flags & (re.ASCII | re.LOCALE)
+                or self.UNSAFE_PAT.search(pattern.pattern)
+            ):
+                raise ValueError(f"Unsupported pattern {pattern.pattern!r}")
+            regex = self.GLOBAL_FLAGS_PAT.sub("", pattern.pattern)
+            regex = self.NAMED_GROUP_PAT.sub("(?:", regex)
+            flags = "".join(
+                letter for flag, letter in self.SCOPED_FLAGS.items()
+                if pattern.flags & flag
+            )
+            if pattern.flags & re.VERBOSE:
+                # a trailing comment would otherwise swallow the closing paren
+                regex += "\n"
+            end = r"\Z" if self.fullmatch else ""
+            alternatives.append(f"(?{flags}:{regex}){end}(?P<_{index}>)")
+        return re.compile("|".join(alternatives))
+
+    def search_index(self, string: str) -> Optional[int]:
+        """Return the index of the first matching pattern, or None."""
+        if self.regex is None:
+            for index, pattern in enumerate(self.patterns):
+                if self._match(pattern, string):
+                    return index
+            return None
+        m = self.regex.match(string)
+        # the tag group of the matching alternative is the last one to close
+        return int(m.lastgroup[1:]) if m else None
+
+    def match(self, string: str) -> Optional[Tuple[int, re.Match]]:
+        """Return the index and the match object of the first matching pattern."""
+        index = self.search_index(string)
+        if index is None:
+            return None
+        return index, self._match(self.patterns[index], string)
+
+    def _match(self, pattern: re.Pattern, string: str) -> Optional[re.Match]:
+        return pattern.fullmatch(string) if self.fullmatch else pattern.match(string)
+
+
 def open_file(path):
     try:
         if sys.platform == "darwin":